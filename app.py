@@ -1,11 +1,12 @@
 from flask import Flask, request, jsonify, render_template, redirect, session, url_for, flash, Response
-from flask import send_file
+from flask import send_file, stream_with_context
 import io
 import gspread
 from google.oauth2.service_account import Credentials
 import firebase_admin
 from firebase_admin import credentials, firestore
 from markupsafe import Markup
+from werkzeug.security import check_password_hash
 import json
 import os
 from dotenv import load_dotenv
@@ -13,14 +14,41 @@ import mysql.connector
 from datetime import datetime
 from functools import wraps 
 import csv
-import pandas as pd
 from flask_wtf.csrf import generate_csrf
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 import logging
 import functools
+import threading
+import time
+import hashlib
+import heapq
+import hmac
+import itertools
+import re
+import random
+import sqlite3
+import tempfile
+import requests
+from collections import Counter, defaultdict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager, suppress
+from dataclasses import dataclass
 import google.cloud.exceptions
 
+try:
+    import openpyxl  # optional: XLSX export
+except ImportError:
+    openpyxl = None
+
+try:  # optional: PDF export
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import LongTable, Paragraph, SimpleDocTemplate, TableStyle
+except ImportError:
+    SimpleDocTemplate = None
+
 logging.basicConfig(level=logging.DEBUG)
 
 # Initialize Flask app with enhanced security
@@ -47,22 +75,55 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
+# --- Lazy Client Handles ---
+class LazyHandle:
+    """Thread-safe proxy that builds its target on first use.
+
+    Importing the app makes no network calls; the Sheets and Firestore clients
+    connect the first time a request or background worker touches them. A
+    failed connection is retried on the next use.
+    """
+
+    def __init__(self, factory, name):
+        self._factory = factory
+        self._name = name
+        self._lock = threading.Lock()
+        self._target = None
+
+    def resolve(self):
+        if self._target is None:
+            with self._lock:
+                if self._target is None:
+                    try:
+                        self._target = self._factory()
+                    except Exception as e:
+                        logging.error(f"❌ Failed to initialize {self._name}: {str(e)}")
+                        raise
+                    logging.info(f"✅ Initialized {self._name}")
+        return self._target
+
+    @property
+    def ready(self):
+        return self._target is not None
+
+    def __getattr__(self, attr):
+        return getattr(self.resolve(), attr)
+
+
 # Initialize Firebase Admin SDK with custom database
-if not firebase_admin._apps:
-    try:
+def init_firestore():
+    if not firebase_admin._apps:
         cred = credentials.Certificate("iamadinkra-ff3a4-firebase-adminsdk-zt74q-eacb9796ce.json")
         firebase_admin.initialize_app(cred, {
             'projectId': 'iamadinkra-ff3a4',
             'storageBucket': 'iamadinkra-ff3a4.appspot.com',
             'databaseURL': 'https://iamadinkra-ff3a4.firebaseio.com'
         })
-        logging.info("Firebase Admin SDK initialized successfully")
-    except Exception as e:
-        logging.error(f"Firebase initialization failed: {str(e)}")
-        raise
+    # Connect to specific Firestore database
+    return firestore.client()
+
 
-# Connect to specific Firestore database
-db = firestore.client()
+db = LazyHandle(init_firestore, "Firestore")
 
 # Security headers middleware
 @app.after_request
@@ -74,76 +135,2440 @@ def add_security_headers(response):
         response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
     return response
 
-# Load Google Sheets credentials
-try:
-    with open("iamadinkra-ff3a4-864ca2842b01.json", "r") as file:
-        creds_dict = json.load(file)
-    
-    # Google Sheets setup
-    SCOPES = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
+# Google Sheets setup
+SCOPES = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
+SPREADSHEET_NAME = "J&O Wedding Guest Data 2025"
+READ_CREDENTIALS_FILE = "iamadinkra-ff3a4-864ca2842b01.json"
+WRITE_CREDENTIALS_FILE = "iamadinkra-ff3a4-65cdad8107d1.json"
+
+MASTER_SHEET = "Master Guest Sheet"
+CHECKIN_SHEET = "Guest Check-In"
+RSVP_LOG_SHEET = "RSVP Logging"
+REFERENCE_SHEET = "Reference Sheet"
+
+
+def authorize_from_file(path):
+    return gspread.authorize(Credentials.from_service_account_file(path, scopes=SCOPES))
+
+
+gc_read = LazyHandle(lambda: authorize_from_file(READ_CREDENTIALS_FILE), "Sheets read client")
+gc_write = LazyHandle(lambda: authorize_from_file(WRITE_CREDENTIALS_FILE), "Sheets write client")
+
+# --- Sheets Quota ---
+SHEETS_READ_QUOTA = int(os.getenv("SHEETS_READ_QUOTA", 60))  # read requests per minute per service account
+SHEETS_WRITE_QUOTA = int(os.getenv("SHEETS_WRITE_QUOTA", 60))  # write requests per minute per service account
+SHEETS_MAX_RETRIES = int(os.getenv("SHEETS_MAX_RETRIES", 5))
+SHEETS_RETRY_MAX_DELAY = 32  # seconds
+SHEETS_READ_METHODS = frozenset({
+    'get', 'get_values', 'get_all_values', 'get_all_records', 'batch_get', 'col_values', 'row_values',
+    'acell', 'cell', 'range', 'find', 'findall',
+})
+SHEETS_WRITE_METHODS = frozenset({
+    'update', 'batch_update', 'update_cell', 'update_acell', 'update_cells', 'batch_clear', 'clear',
+    'append_row', 'append_rows', 'insert_row', 'insert_rows', 'delete_rows', 'delete_row',
+})
+# A retried append or insert would repeat itself if the failed attempt actually landed
+SHEETS_NON_IDEMPOTENT_METHODS = frozenset({'append_row', 'append_rows', 'insert_row', 'insert_rows',
+                                           'delete_rows', 'delete_row'})
+
+
+def api_status(error):
+    if isinstance(error, gspread.exceptions.APIError):
+        return getattr(error.response, 'status_code', None) or getattr(error, 'code', None)
+    return None
+
+
+def is_retryable_error(error):
+    """True for quota (429), server-side (5xx) and connectivity failures."""
+    status = api_status(error)
+    if status is not None:
+        return status == 429 or (isinstance(status, int) and status >= 500)
+    return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+
+class TokenBucket:
+    """Client-side per-minute request budget; callers queue for a token instead of failing."""
+
+    def __init__(self, per_minute):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1, per_minute)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.calls = 0
+        self.waited_seconds = 0.0
+        self.throttled = 0
+
+    def available(self):
+        with self._lock:
+            return min(self.capacity, self._tokens + (time.monotonic() - self._updated) * self.rate)
+
+    def acquire(self):
+        started = time.monotonic()
+        with self._lock:
+            self.waiting += 1
+        try:
+            while True:
+                with self._lock:
+                    now = time.monotonic()
+                    self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    delay = (1 - self._tokens) / self.rate
+                time.sleep(delay)
+        finally:
+            with self._lock:
+                self.waiting -= 1
+                self.calls += 1
+                self.waited_seconds += time.monotonic() - started
+
+    def drain(self):
+        """Google rejected a call for quota: stop handing out tokens until the bucket refills."""
+        with self._lock:
+            self._tokens = 0.0
+            self._updated = time.monotonic()
+            self.throttled += 1
+
+    def info(self):
+        with self._lock:
+            return {
+                'per_minute': round(self.rate * 60),
+                'queue_depth': self.waiting,
+                'calls': self.calls,
+                'throttled': self.throttled,
+                'waited_seconds': round(self.waited_seconds, 3),
+                'avg_wait_ms': round(1000 * self.waited_seconds / self.calls, 1) if self.calls else 0.0,
+            }
+
+
+class SheetsQuota:
+    """One token bucket per (service account, read|write)."""
+
+    def __init__(self, read_per_minute, write_per_minute):
+        self._limits = {'read': read_per_minute, 'write': write_per_minute}
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, account, op_class):
+        with self._lock:
+            key = (account, op_class)
+            if key not in self._buckets:
+                self._buckets[key] = TokenBucket(self._limits[op_class])
+            return self._buckets[key]
+
+    def info(self):
+        with self._lock:
+            buckets = dict(self._buckets)
+        return {f"{account}:{op_class}": bucket.info() for (account, op_class), bucket in buckets.items()}
+
+
+class QuotaWorksheet:
+    """Worksheet proxy that spends a quota token per API call and retries 429/5xx with jittered backoff.
+
+    Calls that may have landed before failing (appends, inserts, deletes)
+    are only retried on 429 or a connect timeout, never after a 5xx.
+    """
+
+    def __init__(self, worksheet, account, quota, retries=SHEETS_MAX_RETRIES):
+        self._worksheet = worksheet
+        self.account = account
+        self._quota = quota
+        self._retries = retries
+
+    def read_tokens(self):
+        return self._quota.bucket(self.account, 'read').available()
+
+    @staticmethod
+    def _may_retry(attr, error):
+        if not is_retryable_error(error):
+            return False
+        if attr not in SHEETS_NON_IDEMPOTENT_METHODS:
+            return True
+        # The request may already have landed unless Google refused it or we never connected
+        return api_status(error) == 429 or isinstance(error, requests.exceptions.ConnectTimeout)
+
+    def __getattr__(self, attr):
+        if attr in SHEETS_READ_METHODS:
+            op_class = 'read'
+        elif attr in SHEETS_WRITE_METHODS:
+            op_class = 'write'
+        else:
+            return getattr(self._worksheet, attr)
+        method = getattr(self._worksheet, attr)
+        bucket = self._quota.bucket(self.account, op_class)
+
+        @functools.wraps(method)
+        def call(*args, **kwargs):
+            for attempt in range(self._retries + 1):
+                bucket.acquire()
+                try:
+                    return method(*args, **kwargs)
+                except Exception as e:
+                    status = api_status(e)
+                    if status == 429:
+                        bucket.drain()
+                    if not self._may_retry(attr, e) or attempt == self._retries:
+                        raise
+                    delay = min(SHEETS_RETRY_MAX_DELAY, 2 ** attempt) + random.uniform(0, 1)
+                    logging.warning(f"⏳ Sheets {attr} failed ({status or type(e).__name__}), retry {attempt + 1} in {delay:.1f}s")
+                    time.sleep(delay)
+
+        return call
+
+
+sheets_quota = SheetsQuota(SHEETS_READ_QUOTA, SHEETS_WRITE_QUOTA)
+
+# Separate read and write clients; each worksheet opens on first use and is quota-limited per service account
+sheet_read = LazyHandle(lambda: gc_read.open(SPREADSHEET_NAME), "spreadsheet (read)")
+
+sheet_write = LazyHandle(lambda: gc_write.open(SPREADSHEET_NAME), "spreadsheet (write)")
+sheet1_write = QuotaWorksheet(LazyHandle(lambda: sheet_write.worksheet(MASTER_SHEET), MASTER_SHEET + " (write)"),
+                              WRITE_CREDENTIALS_FILE, sheets_quota)
+sheet2_write = QuotaWorksheet(LazyHandle(lambda: sheet_write.worksheet(CHECKIN_SHEET), CHECKIN_SHEET + " (write)"),
+                              WRITE_CREDENTIALS_FILE, sheets_quota)
+sheet3_write = QuotaWorksheet(LazyHandle(lambda: sheet_write.worksheet(RSVP_LOG_SHEET), RSVP_LOG_SHEET + " (write)"),
+                              WRITE_CREDENTIALS_FILE, sheets_quota)
+
+# --- Sheets Read Pool ---
+SHEETS_READ_CREDENTIALS = [path.strip() for path in os.getenv(
+    "SHEETS_READ_CREDENTIALS", f"{READ_CREDENTIALS_FILE},{WRITE_CREDENTIALS_FILE}").split(',') if path.strip()]
+SHEETS_THROTTLE_COOLDOWN = 60  # seconds a throttled account sits out of the read pool
+
+
+def service_account_email(path):
+    try:
+        with open(path) as f:
+            return json.load(f).get('client_email') or path
+    except (OSError, ValueError):
+        return path
+
+
+class ReadPool:
+    """Spreads reads of one worksheet across several service accounts, each with its own quota.
+
+    A read goes to the account with the most read tokens left, round-robin
+    on ties. An account that answers 429 sits out for SHEETS_THROTTLE_COOLDOWN
+    seconds and the read moves straight on to the next one. If every account
+    is cooling down, the least recently throttled one is tried after a backoff.
+    A 5xx or connection error is not specific to one account, so it always
+    backs off with jitter before the next attempt.
+    Anything other than a read goes to the first account.
+    """
+
+    def __init__(self, members):
+        self._members = members
+        self._throttled_at = {member.account: 0.0 for member in members}
+        self._turn = itertools.count()
+
+    def _candidates(self):
+        now = time.time()
+        start = next(self._turn) % len(self._members)
+        rotated = self._members[start:] + self._members[:start]
+        healthy = [member for member in rotated if now - self._throttled_at[member.account] >= SHEETS_THROTTLE_COOLDOWN]
+        healthy.sort(key=lambda member: -int(member.read_tokens()))  # stable, so ties keep the rotation
+        cooling = sorted((member for member in rotated if member not in healthy),
+                         key=lambda member: self._throttled_at[member.account])
+        return healthy, cooling
+
+    def __getattr__(self, attr):
+        if attr not in SHEETS_READ_METHODS:
+            return getattr(self._members[0], attr)
+
+        def call(*args, **kwargs):
+            for attempt in range(SHEETS_MAX_RETRIES + 1):
+                healthy, cooling = self._candidates()
+                member = (healthy or cooling)[0]
+                try:
+                    return getattr(member, attr)(*args, **kwargs)
+                except Exception as e:
+                    if not is_retryable_error(e) or attempt == SHEETS_MAX_RETRIES:
+                        raise
+                    status = api_status(e)
+                    if status == 429:
+                        self._throttled_at[member.account] = time.time()
+                        logging.warning(f"⏳ Read quota hit for {member.account}; resting it for {SHEETS_THROTTLE_COOLDOWN}s")
+                        if len(healthy) > 1:
+                            continue  # another account still has quota
+                    delay = min(SHEETS_RETRY_MAX_DELAY, 2 ** attempt) + random.uniform(0, 1)
+                    logging.warning(f"⏳ Sheets {attr} failed ({status or type(e).__name__}), retry {attempt + 1} in {delay:.1f}s")
+                    time.sleep(delay)
+
+        return call
+
+    def info(self):
+        now = time.time()
+        return {member.account: {
+            'cooling_down': now - self._throttled_at[member.account] < SHEETS_THROTTLE_COOLDOWN,
+            'read_tokens': int(member.read_tokens()),
+        } for member in self._members}
+
+
+def read_pool_spreadsheets(paths):
+    """One spreadsheet handle per distinct service account, reusing the read and write clients."""
+    known = {READ_CREDENTIALS_FILE: sheet_read, WRITE_CREDENTIALS_FILE: sheet_write}
+    accounts = {}
+    for path in paths:
+        email = service_account_email(path)
+        if email in accounts:
+            continue  # the same account listed twice has one quota, not two
+        accounts[email] = (path, known.get(path) or LazyHandle(
+            lambda path=path: authorize_from_file(path).open(SPREADSHEET_NAME), f"spreadsheet ({path})"))
+    return list(accounts.values())
+
+
+def pooled_worksheet(title):
+    return ReadPool([
+        QuotaWorksheet(LazyHandle(lambda spreadsheet=spreadsheet: spreadsheet.worksheet(title), f"{title} ({path})"),
+                       path, sheets_quota, retries=0)
+        for path, spreadsheet in read_pool_spreadsheets(SHEETS_READ_CREDENTIALS)
+    ])
+
+
+# Reads of the hot worksheets are spread across every configured service account
+sheet1_read = pooled_worksheet(MASTER_SHEET)
+sheet4_read = pooled_worksheet(REFERENCE_SHEET)
+
+
+# --- Shared State ---
+SHARED_STATE_BACKEND = os.getenv("SHARED_STATE_BACKEND", "memory")  # memory | sqlite
+SHARED_STATE_PATH = os.getenv("SHARED_STATE_PATH", "shared_state.sqlite3")
+SHARED_LOCK_TIMEOUT = 30  # seconds to wait for a shared lock
+SHARED_LOCK_LEASE = 60  # seconds before a crashed holder's lock expires
+
+
+class MemorySharedState:
+    """Shared state for a single worker process.
+
+    Holds named snapshots, version counters and member sets. `SqliteSharedState`
+    implements the same interface on a WAL-mode file so several gunicorn
+    workers on one host see the same caches, versions and check-ins.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = defaultdict(int)
+        self._snapshots = {}
+        self._members = defaultdict(dict)
+        self._events = defaultdict(deque)
+        self._event_ids = defaultdict(int)
+        self._replaced_through = defaultdict(int)
+        self._event_added = threading.Condition(self._lock)
+        self._named_locks = {}
+
+    def get_version(self, name):
+        return self._versions[name]
+
+    def put_snapshot(self, name, value):
+        with self._lock:
+            self._versions[name] += 1
+            self._snapshots[name] = (self._versions[name], time.time(), value)
+            return self._versions[name]
+
+    def get_snapshot(self, name):
+        """Return `(version, updated_at, value)` or `None`."""
+        return self._snapshots.get(name)
+
+    def add_member(self, name, member):
+        with self._lock:
+            if member in self._members[name]:
+                return False
+            self._members[name][member] = time.time()
+            self._versions[name] += 1
+            return True
+
+    def remove_member(self, name, member):
+        with self._lock:
+            if self._members[name].pop(member, None) is not None:
+                self._versions[name] += 1
+
+    def has_member(self, name, member):
+        return member in self._members[name]
+
+    def members(self, name):
+        return set(self._members[name])
+
+    def count_members(self, name):
+        return len(self._members[name])
+
+    def replace_members(self, name, members, added_before):
+        """Make the set equal `members`, keeping anything added at or after `added_before`."""
+        with self._lock:
+            current = self._members[name]
+            now = time.time()
+            updated = {member: added_at for member, added_at in current.items()
+                       if member in members or added_at >= added_before}
+            for member in members:
+                updated.setdefault(member, now)
+            if updated.keys() != current.keys():
+                self._versions[name] += 1
+            self._members[name] = updated
+
+
+    @contextmanager
+    def lock(self, name, timeout=SHARED_LOCK_TIMEOUT):
+        with self._lock:
+            named = self._named_locks.setdefault(name, threading.Lock())
+        if not named.acquire(timeout=timeout):
+            raise TimeoutError(f"Timed out waiting for lock '{name}'")
+        try:
+            yield
+        finally:
+            named.release()
+
+    def append_event(self, name, payload):
+        with self._lock:
+            self._event_ids[name] += 1
+            self._events[name].append((self._event_ids[name], payload))
+            self._event_added.notify_all()
+            return self._event_ids[name]
+
+    def replace_events(self, name, payloads, keep_after):
+        """Swap the stream's events for `payloads`, followed by any events after id `keep_after`.
+
+        Ids keep counting up, and cursors into the replaced events are reported
+        as missed so readers start over.
+        """
+        with self._lock:
+            kept = [payload for event_id, payload in self._events[name] if event_id > keep_after]
+            self._replaced_through[name] = self._event_ids[name]
+            self._events[name] = deque()
+            for payload in list(payloads) + kept:
+                self._event_ids[name] += 1
+                self._events[name].append((self._event_ids[name], payload))
+            self._event_added.notify_all()
+
+    def latest_event_id(self, name):
+        return self._event_ids[name]
+
+    def events_since(self, name, after_id, limit=100):
+        """Return `(id, payload)` events after `after_id`, or `None` if the cursor is no longer valid.
+
+        Cursor 0 always reads from the start. A cursor into events that were
+        replaced, or past the latest event, is not valid.
+        """
+        with self._lock:
+            if 0 < after_id <= self._replaced_through[name] or after_id > self._event_ids[name]:
+                return None
+            events = self._events[name]
+            # Ids are consecutive, so the first event after `after_id` can be found by offset
+            start = max(0, after_id - events[0][0] + 1) if events else 0
+            return list(itertools.islice(events, start, None if limit is None else start + limit))
+
+    def wait_for_event(self, name, after_id, timeout):
+        with self._lock:
+            self._event_added.wait_for(lambda: self._event_ids[name] > after_id, timeout)
+
+
+class SqliteSharedState:
+    """Shared state stored in a WAL-mode SQLite file visible to every worker on the host."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS snapshots"
+                " (name TEXT PRIMARY KEY, version INTEGER NOT NULL, updated_at REAL NOT NULL, payload TEXT NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS members"
+                " (name TEXT NOT NULL, member TEXT NOT NULL, added_at REAL NOT NULL, PRIMARY KEY (name, member))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS events (id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " name TEXT NOT NULL, payload TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS events_name ON events (name, id)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS locks (name TEXT PRIMARY KEY, token TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
 
-    read_credentials = Credentials.from_service_account_file("iamadinkra-ff3a4-864ca2842b01.json", scopes=SCOPES)
-    write_credentials = Credentials.from_service_account_file("iamadinkra-ff3a4-65cdad8107d1.json", scopes=SCOPES)
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _bump(conn, name):
+        conn.execute(
+            "INSERT INTO versions (name, version) VALUES (?, 1)"
+            " ON CONFLICT(name) DO UPDATE SET version = version + 1", (name,)
+        )
+        return conn.execute("SELECT version FROM versions WHERE name = ?", (name,)).fetchone()[0]
+
+    def get_version(self, name):
+        row = self._connect().execute("SELECT version FROM versions WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def put_snapshot(self, name, value):
+        with self._connect() as conn:
+            version = self._bump(conn, name)
+            conn.execute(
+                "INSERT OR REPLACE INTO snapshots (name, version, updated_at, payload) VALUES (?, ?, ?, ?)",
+                (name, version, time.time(), json.dumps(value))
+            )
+            return version
+
+    def get_snapshot(self, name):
+        row = self._connect().execute(
+            "SELECT version, updated_at, payload FROM snapshots WHERE name = ?", (name,)
+        ).fetchone()
+        return (row[0], row[1], json.loads(row[2])) if row else None
+
+    def add_member(self, name, member):
+        with self._connect() as conn:
+            added = conn.execute(
+                "INSERT OR IGNORE INTO members (name, member, added_at) VALUES (?, ?, ?)",
+                (name, member, time.time())
+            ).rowcount == 1
+            if added:
+                self._bump(conn, name)
+            return added
+
+    def remove_member(self, name, member):
+        with self._connect() as conn:
+            if conn.execute("DELETE FROM members WHERE name = ? AND member = ?", (name, member)).rowcount:
+                self._bump(conn, name)
+
+    def has_member(self, name, member):
+        return self._connect().execute(
+            "SELECT 1 FROM members WHERE name = ? AND member = ?", (name, member)
+        ).fetchone() is not None
+
+    def members(self, name):
+        return {member for (member,) in self._connect().execute("SELECT member FROM members WHERE name = ?", (name,))}
+
+    def count_members(self, name):
+        return self._connect().execute("SELECT COUNT(*) FROM members WHERE name = ?", (name,)).fetchone()[0]
+
+    def replace_members(self, name, members, added_before):
+        members = set(members)
+        with self._connect() as conn:
+            current = {member: added_at for member, added_at in conn.execute(
+                "SELECT member, added_at FROM members WHERE name = ?", (name,)
+            )}
+            stale = [(name, member) for member, added_at in current.items()
+                     if member not in members and added_at < added_before]
+            missing = [(name, member, time.time()) for member in members if member not in current]
+            conn.executemany("DELETE FROM members WHERE name = ? AND member = ?", stale)
+            conn.executemany("INSERT OR IGNORE INTO members (name, member, added_at) VALUES (?, ?, ?)", missing)
+            if stale or missing:
+                self._bump(conn, name)
+
+
+    @contextmanager
+    def lock(self, name, timeout=SHARED_LOCK_TIMEOUT):
+        """Cross-process lock held as a lease row; a crashed holder's lease expires."""
+        token = os.urandom(8).hex()
+        deadline = time.time() + timeout
+        while True:
+            now = time.time()
+            with self._connect() as conn:
+                acquired = conn.execute(
+                    "INSERT INTO locks (name, token, expires_at) VALUES (?, ?, ?)"
+                    " ON CONFLICT(name) DO UPDATE SET token = excluded.token, expires_at = excluded.expires_at"
+                    " WHERE locks.expires_at < ?", (name, token, now + SHARED_LOCK_LEASE, now)
+                ).rowcount
+            if acquired:
+                break
+            if now > deadline:
+                raise TimeoutError(f"Timed out waiting for lock '{name}'")
+            time.sleep(0.05)
+        try:
+            yield
+        finally:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM locks WHERE name = ? AND token = ?", (name, token))
+
+    def append_event(self, name, payload):
+        with self._connect() as conn:
+            return conn.execute(
+                "INSERT INTO events (name, payload, created_at) VALUES (?, ?, ?)",
+                (name, json.dumps(payload), time.time())
+            ).lastrowid
+
+    def replace_events(self, name, payloads, keep_after):
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")  # no append may land between reading the kept events and deleting
+            kept = [payload for (payload,) in conn.execute(
+                "SELECT payload FROM events WHERE name = ? AND id > ? ORDER BY id", (name, keep_after)
+            )]
+            latest = conn.execute("SELECT MAX(id) FROM events WHERE name = ?", (name,)).fetchone()[0] or 0
+            conn.execute("DELETE FROM events WHERE name = ?", (name,))
+            now = time.time()
+            conn.executemany("INSERT INTO events (name, payload, created_at) VALUES (?, ?, ?)",
+                             [(name, json.dumps(payload), now) for payload in payloads]
+                             + [(name, payload, now) for payload in kept])
+            conn.execute(
+                "INSERT INTO versions (name, version) VALUES (?, ?)"
+                " ON CONFLICT(name) DO UPDATE SET version = excluded.version", (f"{name}:replaced", latest)
+            )
 
-    gc_read = gspread.authorize(read_credentials)
-    gc_write = gspread.authorize(write_credentials)
+    def latest_event_id(self, name):
+        row = self._connect().execute("SELECT MAX(id) FROM events WHERE name = ?", (name,)).fetchone()
+        return row[0] or 0
 
-    creds = Credentials.from_service_account_info(creds_dict, scopes=SCOPES)
-    client = gspread.authorize(creds)
-    logging.info("Google Sheets credentials loaded successfully")
-except Exception as e:
-    logging.error(f"Failed to load Google Sheets credentials: {str(e)}")
-    raise
+    def events_since(self, name, after_id, limit=100):
+        if 0 < after_id <= self.get_version(f"{name}:replaced") or after_id > self.latest_event_id(name):
+            return None
+        return [(event_id, json.loads(payload)) for event_id, payload in self._connect().execute(
+            "SELECT id, payload FROM events WHERE name = ? AND id > ? ORDER BY id LIMIT ?",
+            (name, after_id, -1 if limit is None else limit)
+        )]
 
+    def wait_for_event(self, name, after_id, timeout):
+        deadline = time.time() + timeout
+        while self.latest_event_id(name) <= after_id and time.time() < deadline:
+            time.sleep(min(0.5, timeout))
 
-# Open Google Sheets with separate read and write clients
-try:
-    # READ client sheets
-    sheet_read = gc_read.open("J&O Wedding Guest Data 2025")
-    sheet1_read = sheet_read.worksheet("Master Guest Sheet")
-    sheet4_read = sheet_read.worksheet("Reference Sheet")
 
-    # WRITE client sheets
-    sheet_write = gc_write.open("J&O Wedding Guest Data 2025")
-    sheet1_write = sheet_write.worksheet("Master Guest Sheet")
-    sheet2_write = sheet_write.worksheet("Guest Check-In")
-    sheet3_write = sheet_write.worksheet("RSVP Logging")
+def create_shared_state(backend, path):
+    if backend == 'sqlite':
+        logging.info(f"Using SQLite shared state at {path}")
+        return SqliteSharedState(path)
+    if backend != 'memory':
+        logging.warning(f"Unknown SHARED_STATE_BACKEND '{backend}', falling back to memory")
+    return MemorySharedState()
 
-    logging.info("✅ Connected to Google Sheets (read/write) successfully!")
-except Exception as e:
-    logging.error(f"❌ Error connecting to Google Sheets: {e}")
-    raise
 
-demOdata = sheet4_read.get('D2:H2')
+shared_state = create_shared_state(SHARED_STATE_BACKEND, SHARED_STATE_PATH)
 
-first_row = next((row for row in demOdata if any(cell.strip() for cell in row)), None)
 
-print("First Confirmed Rsvp Row:", first_row)
+# --- Single-Flight Reads ---
+SHEETS_READ_REUSE_SECONDS = float(os.getenv("SHEETS_READ_REUSE_SECONDS", 1))  # seconds
 
-# --- Preload Guest Data ---
-def load_guest_data():
-    global guest_data_dict
-    try:
-        records = sheet1_read.get_values()
-        headers = records[0]
-        guest_data_dict = {row[1]: dict(zip(headers, row)) for row in records[1:] if len(row) > 1}
-        logging.info(f"✅ Loaded {len(guest_data_dict)} guest records into memory.")
-    except Exception as e:
-        logging.error(f"Failed to load guest data: {str(e)}")
-        guest_data_dict = {}
 
+@dataclass
+class Flight:
+    started_at: float
+    future: Future
+    finished_at: float = None
 
-load_guest_data()
 
-# --- Database Health Check ---
-def check_firestore_connection():
-    try:
-        db.collection('admin').document('admin001').get()
-        print("✅Firestore connected suscessfully")
+class SingleFlight:
+    """Concurrent calls for the same key share one in-flight fetch, and its result for `reuse` seconds after.
+
+    A caller that must see data read after some moment passes `fresh_after`
+    and only joins a flight that started at or after it. Results are shared
+    between callers, so they must not be mutated.
+    """
+
+    def __init__(self, reuse=0):
+        self.reuse = reuse
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.fetches = 0
+        self.shared = 0
+
+    def _usable(self, flight, now, fresh_after):
+        if fresh_after is not None and flight.started_at < fresh_after:
+            return False
+        return flight.finished_at is None or now - flight.finished_at < self.reuse
+
+    def do(self, key, fetch, fresh_after=None):
+        with self._lock:
+            now = time.time()
+            flight = self._flights.get(key)
+            leader = flight is None or not self._usable(flight, now, fresh_after)
+            if leader:
+                flight = self._flights[key] = Flight(now, Future())
+                self.fetches += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            return flight.future.result()
+
+        try:
+            value = fetch()
+        except Exception as e:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            flight.future.set_exception(e)
+            raise
+        with self._lock:
+            flight.finished_at = time.time()
+            if not self.reuse and self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.future.set_result(value)
+        return value
+
+    def info(self):
+        return {'fetches': self.fetches, 'shared': self.shared}
+
+
+# --- Storage Backends ---
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "sheets")  # sheets | sqlite
+STORAGE_PATH = os.getenv("STORAGE_PATH", "wedding.sqlite3")
+SHEETS_MIRROR = os.getenv("SHEETS_MIRROR", "off")  # on | off; mirrors SQLite storage writes to Sheets
+GUEST_CHECKSUM_CELL = os.getenv("GUEST_CHECKSUM_CELL", "")  # e.g. Z1 holding a formula over the guest columns
+# Columns of the Master Guest Sheet the app uses: code, name, designation, attendance, zone, table
+GUEST_READ_COLUMNS = [column.strip().upper() for column in os.getenv("GUEST_READ_COLUMNS", "B,C,D,J,K,L").split(",")]
+GUEST_READ_CHUNK_ROWS = int(os.getenv("GUEST_READ_CHUNK_ROWS", 1000))
+GUEST_READ_WORKERS = int(os.getenv("GUEST_READ_WORKERS", 4))
+_missing_guest_columns = {'B', 'C', 'J', 'K'} - set(GUEST_READ_COLUMNS)  # code, name, attendance, zone
+if _missing_guest_columns:
+    raise ValueError(f"GUEST_READ_COLUMNS must include {', '.join(sorted(_missing_guest_columns))}")
+
+
+def column_runs(letters):
+    """Column letters as contiguous `(first, last)` letter runs, e.g. B,C,D,J,K -> (B, D), (J, K)."""
+    runs = []
+    for index in sorted({gspread.utils.column_letter_to_index(letter.strip()) for letter in letters}):
+        if runs and runs[-1][1] == index - 1:
+            runs[-1][1] = index
+        else:
+            runs.append([index, index])
+    letter = lambda index: re.sub(r'\d', '', gspread.utils.rowcol_to_a1(1, index))
+    return [(letter(first), letter(last)) for first, last in runs]
+
+
+class SheetsStorage:
+    """The Google Sheets workbook and the Firestore `admins` collection.
+
+    Guests are addressed by sheet row number (header on row 1) and column
+    letter, which every backend keeps, so callers never touch a worksheet.
+    """
+
+    name = 'sheets'
+
+    def __init__(self, reuse=SHEETS_READ_REUSE_SECONDS):
+        # Concurrent full-sheet reads share one download, keyed by (worksheet, range)
+        self._reads = SingleFlight(reuse)
+
+    def load_guests(self, fresh_after=None, columns=GUEST_READ_COLUMNS):
+        """The Master Guest Sheet as rows, header first. Only `columns` are read; the rest are left blank."""
+        if columns is None:
+            return self._reads.do((MASTER_SHEET, 'all'), sheet1_read.get_values, fresh_after)
+        columns = sorted(set(columns) | {GUEST_CODE_COLUMN})
+        return self._reads.do((MASTER_SHEET, ','.join(columns)), lambda: self._load_guest_columns(columns), fresh_after)
+
+    def _load_guest_columns(self, columns):
+        # Column B in full tells how far the guest list runs, and the first chunk of every column rides
+        # along in the same request; larger lists fetch the remaining chunks in parallel. Every chunk
+        # carries column B too, so a row inserted or deleted in between is caught and the read retried.
+        runs = column_runs(columns)
+        chunk = GUEST_READ_CHUNK_ROWS
+        code_offset = gspread.utils.column_letter_to_index(GUEST_CODE_COLUMN) - 1
+
+        def ranges(first_row, last_row):
+            return [f'{first}{first_row}:{last}{last_row}' for first, last in runs]
+
+        for _ in range(WRITE_CONFLICT_RETRIES):
+            code_column, *first_chunk = sheet1_read.batch_get(
+                [f'{GUEST_CODE_COLUMN}:{GUEST_CODE_COLUMN}'] + ranges(1, chunk))
+            row_count = len(code_column)
+            chunks = [(1, first_chunk)]
+            starts = range(chunk + 1, row_count + 1, chunk)
+            if starts:
+                with ThreadPoolExecutor(max_workers=min(GUEST_READ_WORKERS, len(starts))) as pool:
+                    fetched = pool.map(
+                        lambda start: sheet1_read.batch_get(ranges(start, min(start + chunk - 1, row_count))), starts)
+                    chunks.extend(zip(starts, fetched))
+
+            width = gspread.utils.column_letter_to_index(runs[-1][1])
+            rows = [[''] * width for _ in range(row_count)]
+            for first_row, value_ranges in chunks:
+                for (first, _), values in zip(runs, value_ranges):
+                    offset = gspread.utils.column_letter_to_index(first) - 1
+                    for row_number, cells in enumerate(values[:row_count - first_row + 1], start=first_row):
+                        rows[row_number - 1][offset:offset + len(cells)] = cells
+            if all(row[code_offset] == (code[0] if code else '') for row, code in zip(rows, code_column)):
+                return rows
+            logging.warning("⚠️ Guest rows moved while reading the Master Guest Sheet, reading it again")
+
+        raise WriteConflict("Guest rows kept moving while reading the guest sheet")
+
+    def guest_change_signal(self):
+        """A checksum cell on the Master Guest Sheet if one is configured, else the file's Drive modifiedTime.
+
+        The modifiedTime covers every tab, so check-ins and RSVP log appends move it too.
+        """
+        if GUEST_CHECKSUM_CELL:
+            return sheet1_read.acell(GUEST_CHECKSUM_CELL).value
+        return sheet_read.get_lastUpdateTime()
+
+    def read_guest_rows(self, row_numbers, last_column):
+        fetched = sheet1_read.batch_get([f'A{row}:{last_column}{row}' for row in row_numbers])
+        return [list(value_range[0]) if value_range else [] for value_range in fetched]
+
+    def guest_codes(self):
+        # Only read after rows were seen to move, so never reuse an older read
+        return self._reads.do(
+            (MASTER_SHEET, f'{GUEST_CODE_COLUMN}:{GUEST_CODE_COLUMN}'),
+            lambda: sheet1_read.col_values(gspread.utils.column_letter_to_index(GUEST_CODE_COLUMN)),
+            fresh_after=time.time()
+        )
+
+    def update_guest_cells(self, updates):
+        sheet1_write.batch_update([{'range': f'{column}{row}', 'values': [[value]]} for row, column, value in updates])
+
+    def delete_guest_row(self, row_number):
+        sheet1_write.delete_rows(row_number)
+
+    def load_check_ins(self, fresh_after=None):
+        return self._reads.do((CHECKIN_SHEET, 'all'), lambda: sheet2_write.get_values()[1:], fresh_after)
+
+    def check_in_codes(self):
+        return self._reads.do((CHECKIN_SHEET, 'B:B'), lambda: sheet2_write.col_values(2)[1:], fresh_after=time.time())
+
+    def append_check_ins(self, rows):
+        sheet2_write.append_rows(rows)
+
+    def load_rsvp_log(self):
+        return sheet3_write.get_values()[1:]
+
+    def append_rsvp_log(self, rows):
+        sheet3_write.append_rows(rows)
+
+    def reference_stats(self):
+        stats_range, seating_range = self._reads.do(
+            (REFERENCE_SHEET, f'{STATS_RANGE},{SEATING_RANGE}'), lambda: sheet4_read.batch_get([STATS_RANGE, SEATING_RANGE])
+        )
+        return DashboardStats.from_ranges(stats_range, seating_range)
+
+    def staff_documents(self, doc_ids):
+        docs = db.get_all([db.collection('admins').document(doc_id) for doc_id in doc_ids])
+        return [(doc.id, doc.to_dict()) for doc in docs if doc.exists]
+
+    def status(self):
+        return {
+            'database': 'connected' if db.ready else 'not connected',
+            'sheets': 'connected' if sheet1_read.ready else 'not connected',
+            'coalesced_reads': self._reads.info(),
+        }
+
+
+class SqliteStorage:
+    """Local SQLite store with the same shape as the workbook, for local runs, load tests or as the primary store.
+
+    Guest rows keep their sheet row numbers and raw cells, plus indexed
+    copies of the columns that are looked up or aggregated. Populate it from
+    the live workbook with `flask --app app import-storage`.
+
+    With `change_log` on, every write also records its worksheet operation
+    in the `changes` table inside the same transaction, for `SheetsMirror`
+    to replay. Each replica's acknowledged offset per worksheet is kept in
+    `replicas`, so replication resumes where it stopped.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path, change_log=False):
+        self.path = path
+        self.change_log = change_log
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS guest_columns (position INTEGER PRIMARY KEY, header TEXT NOT NULL)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS guests (id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " row_number INTEGER NOT NULL, code TEXT NOT NULL, name TEXT NOT NULL, attendance TEXT NOT NULL,"
+                " seating_zone TEXT NOT NULL, table_assigned TEXT NOT NULL, cells TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS guests_row_number ON guests (row_number)")
+            conn.execute("CREATE INDEX IF NOT EXISTS guests_code ON guests (code)")
+            conn.execute("CREATE INDEX IF NOT EXISTS guests_name ON guests (name COLLATE NOCASE)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS check_ins (id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " timestamp TEXT NOT NULL, guest_code TEXT NOT NULL, guest_name TEXT NOT NULL,"
+                " seating TEXT NOT NULL, attended_by TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS check_ins_code ON check_ins (guest_code)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rsvp_log (id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " timestamp TEXT NOT NULL, guest_code TEXT NOT NULL, guest_name TEXT NOT NULL, attendance TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS rsvp_log_code ON rsvp_log (guest_code)")
+            conn.execute("CREATE TABLE IF NOT EXISTS staff (doc_id TEXT PRIMARY KEY, data TEXT NOT NULL)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS changes (seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " worksheet TEXT NOT NULL, op TEXT NOT NULL, payload TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS changes_worksheet ON changes (worksheet, seq)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS replicas (name TEXT NOT NULL, worksheet TEXT NOT NULL,"
+                " acked_seq INTEGER NOT NULL DEFAULT 0, holder TEXT, leased_until REAL NOT NULL DEFAULT 0,"
+                " PRIMARY KEY (name, worksheet))"
+            )
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _log_changes(self, conn, worksheet, op, payloads):
+        if self.change_log:
+            now = time.time()
+            conn.executemany(
+                "INSERT INTO changes (worksheet, op, payload, created_at) VALUES (?, ?, ?, ?)",
+                [(worksheet, op, json.dumps(payload), now) for payload in payloads]
+            )
+
+    def _headers(self, conn):
+        return [header for (header,) in conn.execute("SELECT header FROM guest_columns ORDER BY position")]
+
+    @staticmethod
+    def _guest_values(headers, row_number, cells):
+        def cell(header=None, column=None):
+            index = headers.index(header) if header in headers else column
+            return str(cells[index]) if index is not None and index < len(cells) else ''
+
+        guest_code_index = gspread.utils.column_letter_to_index(GUEST_CODE_COLUMN) - 1
+        attendance_index = gspread.utils.column_letter_to_index(ATTENDANCE_COLUMN) - 1
+        return (row_number, normalize_code(cell(column=guest_code_index)), cell('GUEST FULL NAME'),
+                cell(column=attendance_index), cell('SEATING ZONE'), cell('TABLE ASSIGNED'), json.dumps(cells))
+
+    def _insert_guests(self, conn, headers, rows):
+        conn.executemany(
+            "INSERT INTO guests (row_number, code, name, attendance, seating_zone, table_assigned, cells)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [self._guest_values(headers, row_number, cells) for row_number, cells in rows]
+        )
+
+    def guest_change_signal(self):
+        return None  # reading the local table is already cheap
+
+    def load_guests(self, fresh_after=None, columns=None):
+        # Local reads are cheap, so every column is returned
+        conn = self._connect()
+        rows = [json.loads(cells) for (cells,) in conn.execute("SELECT cells FROM guests ORDER BY row_number")]
+        return [self._headers(conn)] + rows
+
+    def read_guest_rows(self, row_numbers, last_column):
+        width = gspread.utils.column_letter_to_index(last_column)
+        placeholders = ",".join("?" * len(row_numbers))
+        found = dict(self._connect().execute(
+            f"SELECT row_number, cells FROM guests WHERE row_number IN ({placeholders})", list(row_numbers)
+        ).fetchall())
+        return [json.loads(found[row])[:width] if row in found else [] for row in row_numbers]
+
+    def guest_codes(self):
+        conn = self._connect()
+        headers = self._headers(conn)
+        return [headers[1] if len(headers) > 1 else ''] + [
+            code for (code,) in conn.execute("SELECT code FROM guests ORDER BY row_number")
+        ]
+
+    def update_guest_cells(self, updates):
+        with self._connect() as conn:
+            headers = self._headers(conn)
+            for row_number, column, value in updates:
+                found = conn.execute("SELECT id, cells FROM guests WHERE row_number = ?", (row_number,)).fetchone()
+                if found is None:
+                    continue
+                guest_id, cells = found[0], json.loads(found[1])
+                index = gspread.utils.column_letter_to_index(column) - 1
+                cells += [''] * (index + 1 - len(cells))
+                cells[index] = value
+                conn.execute(
+                    "UPDATE guests SET row_number = ?, code = ?, name = ?, attendance = ?, seating_zone = ?,"
+                    " table_assigned = ?, cells = ? WHERE id = ?",
+                    (*self._guest_values(headers, row_number, cells), guest_id)
+                )
+                self._log_changes(conn, MASTER_SHEET, 'update', [{'row': row_number, 'column': column, 'value': value}])
+
+    def delete_guest_row(self, row_number):
+        with self._connect() as conn:
+            found = conn.execute("SELECT code FROM guests WHERE row_number = ?", (row_number,)).fetchone()
+            conn.execute("DELETE FROM guests WHERE row_number = ?", (row_number,))
+            conn.execute("UPDATE guests SET row_number = row_number - 1 WHERE row_number > ?", (row_number,))
+            if found:
+                self._log_changes(conn, MASTER_SHEET, 'delete', [{'row': row_number, 'code': found[0]}])
+
+    def load_check_ins(self, fresh_after=None):
+        return [list(row) for row in self._connect().execute(
+            "SELECT timestamp, guest_code, guest_name, seating, attended_by FROM check_ins ORDER BY id"
+        )]
+
+    def check_in_codes(self):
+        return [code for (code,) in self._connect().execute("SELECT guest_code FROM check_ins ORDER BY id")]
+
+    @staticmethod
+    def _insert_check_ins(conn, rows):
+        conn.executemany(
+            "INSERT INTO check_ins (timestamp, guest_code, guest_name, seating, attended_by) VALUES (?, ?, ?, ?, ?)",
+            [(str(row[0]), normalize_code(row[1]), *(str(value) for value in (list(row[2:5]) + [''] * 3)[:3]))
+             for row in rows]
+        )
+
+    def append_check_ins(self, rows):
+        with self._connect() as conn:
+            self._insert_check_ins(conn, rows)
+            self._log_changes(conn, CHECKIN_SHEET, 'append', rows)
+
+    def load_rsvp_log(self):
+        return [list(row) for row in self._connect().execute(
+            "SELECT timestamp, guest_code, guest_name, attendance FROM rsvp_log ORDER BY id"
+        )]
+
+    @staticmethod
+    def _insert_rsvp_log(conn, rows):
+        conn.executemany(
+            "INSERT INTO rsvp_log (timestamp, guest_code, guest_name, attendance) VALUES (?, ?, ?, ?)",
+            [(str(row[0]), normalize_code(row[1]), *(str(value) for value in (list(row[2:4]) + [''] * 2)[:2]))
+             for row in rows]
+        )
+
+    def append_rsvp_log(self, rows):
+        with self._connect() as conn:
+            self._insert_rsvp_log(conn, rows)
+            self._log_changes(conn, RSVP_LOG_SHEET, 'append', rows)
+
+    def reference_stats(self):
+        """The Reference Sheet's totals, aggregated in SQL."""
+        conn = self._connect()
+        rsvp = dict(conn.execute(
+            "SELECT lower(trim(attendance)), COUNT(*) FROM guests WHERE code != '' GROUP BY 1"
+        ).fetchall())
+        total_guests = conn.execute("SELECT COUNT(*) FROM guests WHERE code != ''").fetchone()[0]
+        seating, total_checked_in = Counter(), 0
+        for zone, table, count in conn.execute(
+            "SELECT seating_zone, table_assigned, COUNT(*) FROM guests"
+            " WHERE code IN (SELECT guest_code FROM check_ins) GROUP BY 1, 2"
+        ):
+            total_checked_in += count
+            for key in {seating_key(zone), seating_key(table)} - {None}:
+                seating[key] += count
+        confirmed, declined = rsvp.get('confirmed', 0), rsvp.get('declined', 0)
+        return DashboardStats(confirmed, declined, confirmed + declined, total_guests, total_checked_in,
+                              seating={key: seating[key] for key in SEATING_KEYS})
+
+    def staff_documents(self, doc_ids):
+        placeholders = ",".join("?" * len(doc_ids))
+        return [(doc_id, json.loads(data)) for doc_id, data in self._connect().execute(
+            f"SELECT doc_id, data FROM staff WHERE doc_id IN ({placeholders})", list(doc_ids)
+        )]
+
+    def status(self):
+        return {'storage': self.path}
+
+    def lease_replica(self, name, worksheet, holder, seconds):
+        """Claim the right to replay `worksheet` for `seconds`; only one worker replicates at a time."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("INSERT OR IGNORE INTO replicas (name, worksheet) VALUES (?, ?)", (name, worksheet))
+            return conn.execute(
+                "UPDATE replicas SET holder = ?, leased_until = ? WHERE name = ? AND worksheet = ?"
+                " AND (leased_until < ? OR holder = ?)", (holder, now + seconds, name, worksheet, now, holder)
+            ).rowcount > 0
+
+    def acked_seq(self, name, worksheet):
+        row = self._connect().execute(
+            "SELECT acked_seq FROM replicas WHERE name = ? AND worksheet = ?", (name, worksheet)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def changes_since(self, worksheet, after_seq, limit):
+        return [(seq, op, json.loads(payload)) for seq, op, payload in self._connect().execute(
+            "SELECT seq, op, payload FROM changes WHERE worksheet = ? AND seq > ? ORDER BY seq LIMIT ?",
+            (worksheet, after_seq, limit)
+        )]
+
+    def ack_changes(self, name, worksheet, seq):
+        """Record `seq` as replicated and drop the changes every replica has now seen."""
+        with self._connect() as conn:
+            conn.execute("UPDATE replicas SET acked_seq = ? WHERE name = ? AND worksheet = ?", (seq, name, worksheet))
+            conn.execute(
+                "DELETE FROM changes WHERE worksheet = ? AND seq <= (SELECT MIN(acked_seq) FROM replicas WHERE worksheet = ?)",
+                (worksheet, worksheet)
+            )
+
+    def change_backlog(self, name, worksheet):
+        """`(pending_count, oldest_created_at)` of changes not yet acknowledged by replica `name`."""
+        return self._connect().execute(
+            "SELECT COUNT(*), MIN(created_at) FROM changes WHERE worksheet = ? AND seq > ?",
+            (worksheet, self.acked_seq(name, worksheet))
+        ).fetchone()
+
+    def import_from(self, source, staff_doc_ids):
+        """Replace everything here with a copy of another backend's data."""
+        records = source.load_guests(columns=None)
+        check_ins = source.load_check_ins()
+        rsvp_log = source.load_rsvp_log()
+        staff = source.staff_documents(staff_doc_ids)
+        with self._connect() as conn:
+            for table in ('guest_columns', 'guests', 'check_ins', 'rsvp_log', 'staff', 'changes', 'replicas'):
+                conn.execute(f"DELETE FROM {table}")
+            headers = records[0] if records else []
+            conn.executemany("INSERT INTO guest_columns (position, header) VALUES (?, ?)", enumerate(headers))
+            self._insert_guests(conn, headers, enumerate(records[1:], start=2))
+            conn.executemany("INSERT INTO staff (doc_id, data) VALUES (?, ?)",
+                             [(doc_id, json.dumps(data)) for doc_id, data in staff])
+            self._insert_check_ins(conn, check_ins)
+            self._insert_rsvp_log(conn, rsvp_log)
+        logging.info(f"✅ Imported {len(records[1:])} guests, {len(check_ins)} check-ins, {len(rsvp_log)} RSVP log rows "
+                     f"and {len(staff)} staff accounts.")
+
+
+def create_storage(backend, path):
+    if backend == 'sqlite':
+        logging.info(f"Using SQLite storage at {path}")
+        return SqliteStorage(path, change_log=SHEETS_MIRROR == 'on')
+    if backend != 'sheets':
+        logging.warning(f"Unknown STORAGE_BACKEND '{backend}', falling back to sheets")
+    return SheetsStorage()
+
+
+storage = create_storage(STORAGE_BACKEND, STORAGE_PATH)
+
+
+# --- Guest Index ---
+# Seconds between change checks; the full sheet is only reloaded on a change. Without a checksum cell the
+# signal is the whole file's modifiedTime, which every check-in flush moves, so the longer interval is kept.
+GUEST_REFRESH_INTERVAL = int(os.getenv("GUEST_REFRESH_INTERVAL", 15 if GUEST_CHECKSUM_CELL else 60))
+GUEST_SNAPSHOT_PATH = os.getenv("GUEST_SNAPSHOT_PATH", "guest_snapshot.json")
+
+
+def normalize_code(code):
+    return (code or '').strip().upper()
+
+
+def row_etag(guest, headers):
+    """Version stamp over the columns of a guest row that were read, ignoring trailing empty cells."""
+    values = [str(guest.get(header, '')) for header in headers]
+    while values and not values[-1]:
+        values.pop()
+    return hashlib.sha1(json.dumps(values).encode('utf-8')).hexdigest()[:16]
+
+
+def guest_record(headers, values):
+    """A guest row as `{header: value}`, leaving out columns that were not read (blank header)."""
+    return {header: value for header, value in zip(headers, values) if header}
+
+
+class GuestIndex:
+    """In-memory snapshot of the Master Guest Sheet keyed by normalized GUEST CODE.
+
+    Every guest lookup reads from here instead of the sheet. The snapshot is
+    published to the shared state store so only one worker per interval has to
+    download it; the others pick up any newer version on their next lookup.
+    Local writes are published the same way.
+
+    With a `change_signal` (a cheap read that moves whenever the sheet
+    changes), the periodic refresher reads the signal first and downloads
+    the full sheet only when it differs from the one stored with the snapshot.
+
+    Every successful refresh is also saved to `snapshot_path`, so a station
+    that starts while Sheets is unreachable can keep answering lookups from
+    the last good copy until a refresh succeeds again.
+    """
+
+    def __init__(self, loader, interval, shared, name='guests', snapshot_path=None, change_signal=None):
+        self._loader = loader
+        self._change_signal = change_signal
+        self.interval = interval
+        self._shared = shared
+        self._name = name
+        self._lock = threading.Lock()
+        self._guests = {}
+        self._rows = {}
+        self._headers = []
+        self._listeners = []
+        self._stop = threading.Event()
+        self._thread = None
+        self.snapshot_path = snapshot_path
+        self.version = 0
+        self.loaded_at = None
+        self.source = None  # 'sheet' or 'snapshot'
+        self.signal = None
+        self.checked_at = None
+        self.failing_since = None
+
+    def _read_signal(self):
+        if self._change_signal is None:
+            return None
+        try:
+            return self._change_signal()
+        except Exception as e:
+            logging.warning(f"Couldn't read the guest sheet change signal, reloading in full: {str(e)}")
+            return None
+
+    def refresh_if_changed(self):
+        """Reload only if the change signal moved since the current snapshot; True if it reloaded."""
+        checked_at = time.time()
+        signal = self._read_signal()
+        # Data restored from the snapshot file is reloaded once from the sheet, even if unchanged
+        if signal is not None and signal == self.signal and self.source == 'sheet':
+            self.checked_at = checked_at
+            return False
+        self.refresh(signal, checked_at)
         return True
-    except Exception as e:
-        logging.error(f"🚫Firestore connection error: {e}")
-        return False
+
+    def refresh(self, signal=None, checked_at=None):
+        # The signal is read before the download, so a change made during it triggers the next reload,
+        # and the download must not be an older one that predates the signal
+        if checked_at is None:
+            checked_at = time.time()
+            signal = self._read_signal()
+        records = self._loader(fresh_after=checked_at)
+        headers = records[0] if records else []
+        guests, rows = {}, {}
+        for row_number, row in enumerate(records[1:], start=2):
+            if len(row) < 2:
+                continue
+            code = normalize_code(row[1])
+            if not code:
+                continue
+            guests[code] = guest_record(headers, row)
+            rows[code] = row_number
+        loaded_at = time.time()
+        self._publish(headers, guests, rows, loaded_at, source='sheet', signal=signal)
+        self.checked_at = loaded_at
+        logging.info(f"✅ Loaded {len(guests)} guest records into memory (version {self.version}).")
+        self._save_snapshot({'headers': headers, 'guests': guests, 'rows': rows, 'loaded_at': loaded_at,
+                             'signal': signal})
+
+    def _save_snapshot(self, snapshot):
+        if not self.snapshot_path:
+            return
+        temp_path = None
+        try:
+            # A unique temp file per write, since refreshes may overlap
+            with tempfile.NamedTemporaryFile('w', dir=os.path.dirname(os.path.abspath(self.snapshot_path)),
+                                             prefix=f"{os.path.basename(self.snapshot_path)}.", suffix='.tmp',
+                                             delete=False) as f:
+                temp_path = f.name
+                json.dump(snapshot, f)
+            os.replace(temp_path, self.snapshot_path)
+            temp_path = None
+        except OSError as e:
+            logging.error(f"Failed to save guest snapshot: {str(e)}")
+        finally:
+            if temp_path is not None:
+                with suppress(OSError):
+                    os.remove(temp_path)
+
+    def load_snapshot(self):
+        """Serve lookups from the snapshot saved at the last successful refresh; True if there was one."""
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return False
+        try:
+            with open(self.snapshot_path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.error(f"Failed to read guest snapshot: {str(e)}")
+            return False
+        self._publish(snapshot['headers'], snapshot['guests'], snapshot['rows'], snapshot['loaded_at'],
+                      source='snapshot', signal=snapshot.get('signal'))
+        logging.warning(f"📴 Serving {len(self._guests)} guests from the local snapshot "
+                        f"saved {datetime.fromtimestamp(self.loaded_at):%Y-%m-%d %H:%M:%S}.")
+        return True
+
+    def _publish(self, headers, guests, rows, loaded_at, source=None, signal=None):
+        snapshot = {'headers': headers, 'guests': guests, 'rows': rows, 'loaded_at': loaded_at,
+                    'source': source or self.source, 'signal': signal if source else self.signal}
+        with self._lock:
+            version = self._shared.put_snapshot(self._name, snapshot)
+            changed, removed = self._apply(version, snapshot)
+        self._notify(guests, changed, removed)
+
+    def _apply(self, version, snapshot):
+        previous = self._guests
+        guests = snapshot['guests']
+        changed = [code for code, guest in guests.items() if previous.get(code) != guest]
+        removed = [code for code in previous if code not in guests]
+        self._guests, self._rows, self._headers = guests, snapshot['rows'], snapshot['headers']
+        self.version, self.loaded_at, self.source = version, snapshot['loaded_at'], snapshot.get('source')
+        self.signal = snapshot.get('signal')
+        return changed, removed
+
+    def sync(self):
+        """Adopt a newer snapshot published by another worker, if there is one."""
+        if self._shared.get_version(self._name) == self.version:
+            return
+        with self._lock:
+            snapshot = self._shared.get_snapshot(self._name)
+            if snapshot is None or snapshot[0] == self.version:
+                return
+            version, _, value = snapshot
+            changed, removed = self._apply(version, value)
+        self._notify(value['guests'], changed, removed)
+
+    def subscribe(self, listener):
+        """Register `listener(index, guests, changed_codes, removed_codes)` for snapshot changes.
+
+        `guests` is the new snapshot's `{code: guest}`. Listeners must read from
+        it rather than `get()`, which may adopt another worker's snapshot and
+        call them again while they still hold their own lock.
+        """
+        self._listeners.append(listener)
+
+    def _notify(self, guests, changed, removed):
+        if not changed and not removed:
+            return
+        for listener in self._listeners:
+            try:
+                listener(self, guests, changed, removed)
+            except Exception as e:
+                logging.error(f"Guest index listener failed: {str(e)}")
+
+    def get(self, code):
+        self.sync()
+        return self._guests.get(normalize_code(code))
+
+    def row_of(self, code):
+        self.sync()
+        return self._rows.get(normalize_code(code))
+
+    def all(self):
+        self.sync()
+        return list(self._guests.values())
+
+    def by_code(self):
+        self.sync()
+        return dict(self._guests)
+
+    @property
+    def headers(self):
+        self.sync()
+        return list(self._headers)
+
+    def etag(self, code):
+        guest = self.get(code)
+        return row_etag(guest, self._headers) if guest is not None else None
+
+    def replace_guests(self, fresh):
+        """Adopt `{code: guest}` rows just read from the sheet."""
+        self.sync()
+        guests = {**self._guests, **{normalize_code(code): guest for code, guest in fresh.items()}}
+        self._publish(self._headers, guests, self._rows, self.loaded_at)
+
+    def header_for(self, column_letter):
+        column = gspread.utils.column_letter_to_index(column_letter) - 1
+        return self._headers[column] if column < len(self._headers) else None
+
+    def set_columns(self, updates):
+        """Apply several `(code, column_letter, value)` writes as one new snapshot version."""
+        self.sync()
+        guests = dict(self._guests)
+        for code, column_letter, value in updates:
+            code = normalize_code(code)
+            header = self.header_for(column_letter)
+            if code in guests and header:
+                guests[code] = {**guests[code], header: value}
+        if guests != self._guests:
+            self._publish(self._headers, guests, self._rows, self.loaded_at)
+
+    def remove_row(self, code):
+        """Drop a deleted guest and shift every row below it up by one."""
+        self.sync()
+        code = normalize_code(code)
+        deleted = self._rows.get(code)
+        if deleted is None:
+            return
+        guests = {other: guest for other, guest in self._guests.items() if other != code}
+        rows = {other: row - 1 if row > deleted else row for other, row in self._rows.items() if other != code}
+        self._publish(self._headers, guests, rows, self.loaded_at)
+
+    def rebuild_rows(self, code_column):
+        """Re-derive every row number from the sheet's GUEST CODE column (header included)."""
+        self.sync()
+        rows = {}
+        for row_number, value in enumerate(code_column[1:], start=2):
+            code = normalize_code(value)
+            if code:
+                rows.setdefault(code, row_number)
+        guests = {code: guest for code, guest in self._guests.items() if code in rows}
+        logging.warning(f"⚠️ Guest rows moved on the sheet; rebuilt row index for {len(rows)} codes.")
+        self._publish(self._headers, guests, {code: row for code, row in rows.items() if code in guests},
+                      self.loaded_at)
+
+    def info(self):
+        self.sync()
+        return {
+            'version': self.version,
+            'count': len(self._guests),
+            'source': self.source,
+            'age_seconds': round(time.time() - self.loaded_at, 1) if self.loaded_at else None,
+            'checked_seconds_ago': round(time.time() - self.checked_at, 1) if self.checked_at else None,
+        }
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="guest-index-refresh", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sync()
+                if self.loaded_at and time.time() - self.loaded_at < self.interval:
+                    continue  # another worker refreshed recently
+                self.refresh_if_changed()
+                self.failing_since = None
+            except Exception as e:
+                self.failing_since = self.failing_since or time.time()
+                logging.error(f"Failed to refresh guest index: {str(e)}")
+
+
+guest_index = GuestIndex(storage.load_guests, GUEST_REFRESH_INTERVAL, shared_state,
+                         snapshot_path=GUEST_SNAPSHOT_PATH, change_signal=storage.guest_change_signal)
+
+
+GUEST_CODE_COLUMN = 'B'
+
+
+# --- Conditional Guest Writes ---
+WRITE_CONFLICT_RETRIES = 3
+MASTER_WRITE_LOCK = 'master-sheet-writes'
+
+
+class WriteConflict(Exception):
+    pass
+
+
+def load_current_rows(codes):
+    """Read the target rows straight from storage in one call, following them if they moved.
+
+    Returns `{code: (row_number, guest)}` for codes still on the sheet. A row
+    whose GUEST CODE cell no longer matches means rows were inserted or deleted,
+    so column B is read once, the row mapping rebuilt, and the read retried.
+    Rows whose contents differ from the index are adopted into it.
+    """
+    codes = list(dict.fromkeys(normalize_code(code) for code in codes))
+    headers = guest_index.headers
+    last_column = re.sub(r'\d', '', gspread.utils.rowcol_to_a1(1, max(len(headers), 2)))
+
+    for _ in range(WRITE_CONFLICT_RETRIES):
+        rows = {code: guest_index.row_of(code) for code in codes if guest_index.row_of(code)}
+        if not rows:
+            return {}
+        fetched = storage.read_guest_rows(list(rows.values()), last_column)
+        current = {}
+        for (code, row), values in zip(rows.items(), fetched):
+            if normalize_code(values[1] if len(values) > 1 else '') != code:
+                break
+            current[code] = (row, guest_record(headers, values))
+        else:
+            stale = {code: guest for code, (_, guest) in current.items()
+                     if row_etag(guest, headers) != guest_index.etag(code)}
+            if stale:
+                guest_index.replace_guests(stale)
+            return current
+        guest_index.rebuild_rows(storage.guest_codes())
+
+    raise WriteConflict("Guest rows kept moving while preparing the write")
+
+
+def write_guest_columns(changes, expected_etags=None):
+    """Conditionally apply `{code: [(column_letter, value), ...]}` to the Master Guest Sheet.
+
+    Writers are serialized by a shared lock and re-read their target rows
+    first, so a row number is never stale. When the caller passes the etag it
+    last saw for a row and the row has changed since, that row is refused as
+    a conflict. Returns `({code: 'ok' | 'not_found' | 'conflict'}, {code: new_etag})`.
+    """
+    expected_etags = {normalize_code(code): etag for code, etag in (expected_etags or {}).items() if etag}
+    changes = {normalize_code(code): columns for code, columns in changes.items()}
+    results, updates, applied = {}, [], []
+
+    with shared_state.lock(MASTER_WRITE_LOCK):
+        current = load_current_rows(changes)
+        headers = guest_index.headers
+        for code, columns in changes.items():
+            if code not in current:
+                results[code] = 'not_found'
+                continue
+            row, guest = current[code]
+            if code in expected_etags and expected_etags[code] != row_etag(guest, headers):
+                results[code] = 'conflict'
+                continue
+            updates += [(row, column, value) for column, value in columns]
+            applied += [(code, column, value) for column, value in columns]
+            results[code] = 'ok'
+
+        if updates:
+            storage.update_guest_cells(updates)
+            guest_index.set_columns(applied)
+
+    return results, {code: guest_index.etag(code) for code, result in results.items() if result == 'ok'}
+
+
+def delete_guest_row(code, expected_etag=None):
+    """Conditionally delete a guest's row; returns 'ok', 'not_found' or 'conflict'."""
+    code = normalize_code(code)
+    with shared_state.lock(MASTER_WRITE_LOCK):
+        current = load_current_rows([code])
+        if code not in current:
+            return 'not_found'
+        row, guest = current[code]
+        if expected_etag and expected_etag != row_etag(guest, guest_index.headers):
+            return 'conflict'
+        storage.delete_guest_row(row)
+        guest_index.remove_row(code)  # shifts the rows below it up by one
+        return 'ok'
+
+
+# --- Guest Search Index ---
+SEARCH_RESULT_LIMIT = 10
+
+
+class GuestSearchIndex:
+    """Bigram inverted index over guest names and codes for the check-in autocomplete.
+
+    Results are ranked exact code first, then name-prefix matches (full name or
+    any word of it), then any other substring match; ties are broken by name
+    and code so the ordering is stable between keystrokes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = defaultdict(set)
+        self._entries = {}
+
+    @staticmethod
+    def _grams(text):
+        return {text[i:i + 2] for i in range(len(text) - 1)}
+
+    def update(self, index, guests, changed, removed):
+        with self._lock:
+            for code in list(changed) + list(removed):
+                self._remove(code)
+            for code in changed:
+                guest = guests.get(code)
+                if guest:
+                    self._add(code, guest)
+
+    def _add(self, code, guest):
+        name = str(guest.get('GUEST FULL NAME', '')).strip().upper()
+        grams = self._grams(code) | self._grams(name)
+        result = {
+            "code": guest.get('GUEST CODE', code),
+            "name": guest.get('GUEST FULL NAME', ''),
+            "table": guest.get('TABLE ASSIGNED', 'Unknown'),
+            "seating": guest.get('SEATING ZONE', 'Unknown'),
+            "designation": guest.get('DESIGNATION', 'Unknown')
+        }
+        self._entries[code] = (name, grams, result)
+        for gram in grams:
+            self._postings[gram].add(code)
+
+    def _remove(self, code):
+        entry = self._entries.pop(code, None)
+        if not entry:
+            return
+        for gram in entry[1]:
+            codes = self._postings.get(gram)
+            if codes is not None:
+                codes.discard(code)
+                if not codes:
+                    del self._postings[gram]
+
+    def search(self, query, limit=SEARCH_RESULT_LIMIT):
+        query = query.strip().upper()
+        if not query:
+            return []
+
+        with self._lock:
+            if len(query) < 2:
+                candidates = self._entries.keys()
+            else:
+                postings = sorted((self._postings.get(gram, set()) for gram in self._grams(query)), key=len)
+                candidates = set.intersection(*postings)
+
+            ranked = []
+            for code in candidates:
+                name, _, result = self._entries[code]
+                if code == query:
+                    rank = 0
+                elif name.startswith(query) or any(word.startswith(query) for word in name.split()):
+                    rank = 1
+                elif query in code or query in name:
+                    rank = 2
+                else:
+                    continue
+                ranked.append((rank, name, code, result))
+
+        return [entry[3] for entry in heapq.nsmallest(limit, ranked, key=lambda entry: entry[:3])]
+
+
+guest_search = GuestSearchIndex()
+guest_index.subscribe(guest_search.update)
+
+# --- Write-Behind Journal ---
+WRITE_JOURNAL_PATH = os.getenv("WRITE_JOURNAL_PATH", "write_journal.sqlite3")
+WRITE_FLUSH_INTERVAL = float(os.getenv("WRITE_FLUSH_INTERVAL", 2))  # seconds
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", 500))
+WRITE_RETRY_BASE_DELAY = 2  # seconds
+WRITE_RETRY_MAX_DELAY = 300  # seconds
+WRITE_CLAIM_SECONDS = 120  # how long a flusher owns a batch before another may retry it
+WRITE_DEDUPE_AFTER = 30  # seconds a row may wait before it's checked against the sheet for duplicates
+
+
+class WriteBehindJournal:
+    """Durable local queue of rows waiting to be appended to a worksheet (or its storage equivalent).
+
+    Requests journal their rows in SQLite and return immediately. A background
+    flusher sends everything pending for a worksheet in one append call
+    per tick and only deletes rows once Sheets has accepted them, so nothing
+    is lost across restarts. Failed batches back off exponentially with jitter.
+
+    Worksheets listed in `unique_columns` as `(column, existing_keys)` are
+    keyed by one column. A batch that waited (storage was unreachable, or the
+    process restarted with rows queued) may race with rows another station
+    wrote meanwhile, so it is checked against the existing keys first and
+    duplicates are dropped.
+    """
+
+    def __init__(self, path, writers, interval, batch_size, unique_columns=None):
+        self.path = path
+        self._writers = writers
+        self._unique_columns = unique_columns or {}
+        self.interval = interval
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._attempts = defaultdict(int)
+        self._retry_at = {}
+        self._thread = None
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pending_rows ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " worksheet TEXT NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " claimed_until REAL NOT NULL DEFAULT 0)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS pending_rows_worksheet ON pending_rows (worksheet, seq)")
+
+    def append(self, worksheet, rows):
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT INTO pending_rows (worksheet, payload, created_at) VALUES (?, ?, ?)",
+                    [(worksheet, json.dumps(row), now) for row in rows]
+                )
+        self._wake.set()
+
+    def pending(self, worksheet):
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT payload FROM pending_rows WHERE worksheet = ? ORDER BY seq", (worksheet,)
+            )
+            return [json.loads(payload) for (payload,) in cursor]
+
+    def depth(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM pending_rows").fetchone()[0]
+
+    def _claim(self, worksheet):
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                # The connection autocommits, so take SQLite's write lock explicitly: another worker sharing
+                # this file must not select the same rows before they are leased
+                self._conn.execute("BEGIN IMMEDIATE")
+                batch = self._conn.execute(
+                    "SELECT seq, payload, created_at FROM pending_rows WHERE worksheet = ? AND claimed_until < ?"
+                    " ORDER BY seq LIMIT ?", (worksheet, now, self.batch_size)
+                ).fetchall()
+                if batch:
+                    self._conn.execute(
+                        "UPDATE pending_rows SET claimed_until = ? WHERE worksheet = ? AND seq <= ? AND claimed_until < ?",
+                        (now + WRITE_CLAIM_SECONDS, worksheet, batch[-1][0], now)
+                    )
+        return [(seq, json.loads(payload), created_at) for seq, payload, created_at in batch]
+
+    def _release(self, seqs, delivered):
+        with self._lock:
+            with self._conn:
+                placeholders = ",".join("?" * len(seqs))
+                if delivered:
+                    self._conn.execute(f"DELETE FROM pending_rows WHERE seq IN ({placeholders})", seqs)
+                else:
+                    self._conn.execute(f"UPDATE pending_rows SET claimed_until = 0 WHERE seq IN ({placeholders})", seqs)
+
+    def stalled(self):
+        """Worksheets whose last flush failed and are waiting to retry."""
+        return sorted(self._retry_at)
+
+    def _drop_duplicates(self, worksheet_name, batch):
+        """Split a batch into rows to send and seqs whose key is already stored (or earlier in the batch)."""
+        column, existing_keys = self._unique_columns[worksheet_name]
+        seen = {normalize_code(value) for value in existing_keys()}
+        keep, duplicates = [], []
+        for seq, row, created_at in batch:
+            key = normalize_code(row[column]) if len(row) > column else ''
+            if key and key in seen:
+                duplicates.append(seq)
+                continue
+            seen.add(key)
+            keep.append((seq, row, created_at))
+        return keep, duplicates
+
+    def flush(self):
+        for worksheet_name, write_rows in self._writers.items():
+            if time.time() < self._retry_at.get(worksheet_name, 0):
+                continue
+            batch = self._claim(worksheet_name)
+            if not batch:
+                continue
+            seqs = [seq for seq, _, _ in batch]
+            try:
+                waited = self._attempts[worksheet_name] or time.time() - batch[0][2] > WRITE_DEDUPE_AFTER
+                if worksheet_name in self._unique_columns and waited:
+                    batch, duplicates = self._drop_duplicates(worksheet_name, batch)
+                    if duplicates:
+                        self._release(duplicates, delivered=True)
+                        seqs = [seq for seq, _, _ in batch]
+                        logging.warning(f"⚠️ Dropped {len(duplicates)} duplicate rows for '{worksheet_name}' after reconnecting")
+                    if not batch:
+                        self._attempts.pop(worksheet_name, None)
+                        continue
+                write_rows([row for _, row, _ in batch])
+            except Exception as e:
+                self._release(seqs, delivered=False)
+                self._attempts[worksheet_name] += 1
+                delay = min(WRITE_RETRY_MAX_DELAY, WRITE_RETRY_BASE_DELAY * 2 ** self._attempts[worksheet_name])
+                self._retry_at[worksheet_name] = time.time() + random.uniform(delay / 2, delay)
+                log = logging.warning if is_retryable_error(e) else logging.error
+                log(f"⏳ Failed to flush {len(batch)} rows to '{worksheet_name}', retrying later: {str(e)}")
+                continue
+            self._release(seqs, delivered=True)
+            self._attempts.pop(worksheet_name, None)
+            self._retry_at.pop(worksheet_name, None)
+            logging.info(f"✅ Flushed {len(batch)} journaled rows to '{worksheet_name}'")
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="write-behind-flusher", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"Write-behind flusher error: {str(e)}")
+
+
+write_journal = WriteBehindJournal(
+    WRITE_JOURNAL_PATH,
+    {CHECKIN_SHEET: storage.append_check_ins, RSVP_LOG_SHEET: storage.append_rsvp_log},
+    WRITE_FLUSH_INTERVAL,
+    WRITE_BATCH_SIZE,
+    unique_columns={CHECKIN_SHEET: (1, storage.check_in_codes)}  # GuestCode
+)
+write_journal.start()
+
+# --- Sheets Mirror ---
+MIRROR_INTERVAL = float(os.getenv("MIRROR_INTERVAL", 2))  # seconds
+
+
+class SheetsMirror:
+    """Replays the SQLite store's change log onto the Google Sheets workbook in the background.
+
+    Each worksheet is an independent stream with its own acknowledged
+    offset. Appends go out as one `append_rows` per tick. Cell updates
+    between two row deletions are coalesced per cell (last value wins) into
+    one `batch_update`. Deletions are replayed one at a time, and only if the
+    row still holds the expected guest code, so replaying after a crash
+    never removes the wrong row. Failures back off like the write-behind journal.
+    """
+
+    def __init__(self, source, worksheets, interval, batch_size, name='sheets'):
+        self._source = source
+        self._worksheets = worksheets
+        self.interval = interval
+        self.batch_size = batch_size
+        self.name = name
+        self._holder = os.urandom(8).hex()
+        self._attempts = defaultdict(int)
+        self._retry_at = {}
+        self._thread = None
+
+    def lag(self):
+        """Replication lag per worksheet: unacknowledged changes and the age of the oldest one."""
+        lag = {}
+        for worksheet_name in self._worksheets:
+            pending, oldest = self._source.change_backlog(self.name, worksheet_name)
+            lag[worksheet_name] = {
+                'acked_seq': self._source.acked_seq(self.name, worksheet_name),
+                'pending_changes': pending,
+                'lag_seconds': round(time.time() - oldest, 1) if oldest else 0.0,
+            }
+        return lag
+
+    @staticmethod
+    def _segments(changes):
+        """Split changes into `(last_seq, op, payloads)` writes, coalescing consecutive updates per cell."""
+        segments = []
+        for seq, op, payload in changes:
+            if segments and segments[-1][1] == op and op != 'delete':
+                segments[-1][0] = seq
+                segments[-1][2].append(payload)
+            else:
+                segments.append([seq, op, [payload]])
+        for segment in segments:
+            if segment[1] == 'update':
+                cells = {}
+                for update in segment[2]:
+                    cells.pop((update['row'], update['column']), None)
+                    cells[(update['row'], update['column'])] = update
+                segment[2] = list(cells.values())
+        return segments
+
+    def _apply(self, worksheet, op, payloads):
+        if op == 'append':
+            worksheet.append_rows(payloads)
+        elif op == 'update':
+            worksheet.batch_update([
+                {'range': f"{update['column']}{update['row']}", 'values': [[update['value']]]} for update in payloads
+            ])
+        elif op == 'delete':
+            deletion = payloads[0]
+            current = worksheet.acell(f"{GUEST_CODE_COLUMN}{deletion['row']}").value
+            if normalize_code(current) == deletion['code']:
+                worksheet.delete_rows(deletion['row'])
+            else:
+                logging.warning(f"Skipped mirroring delete of {deletion['code']}: row {deletion['row']} no longer holds it")
+
+    def replicate(self):
+        for worksheet_name, worksheet in self._worksheets.items():
+            if time.time() < self._retry_at.get(worksheet_name, 0):
+                continue
+            if not self._source.lease_replica(self.name, worksheet_name, self._holder, WRITE_CLAIM_SECONDS):
+                continue  # another worker is replicating this worksheet
+            acked = self._source.acked_seq(self.name, worksheet_name)
+            changes = self._source.changes_since(worksheet_name, acked, self.batch_size)
+            try:
+                for last_seq, op, payloads in self._segments(changes):
+                    self._apply(worksheet, op, payloads)
+                    self._source.ack_changes(self.name, worksheet_name, last_seq)
+            except Exception as e:
+                self._attempts[worksheet_name] += 1
+                delay = min(WRITE_RETRY_MAX_DELAY, WRITE_RETRY_BASE_DELAY * 2 ** self._attempts[worksheet_name])
+                self._retry_at[worksheet_name] = time.time() + random.uniform(delay / 2, delay)
+                log = logging.warning if is_retryable_error(e) else logging.error
+                log(f"⏳ Failed to mirror changes to '{worksheet_name}', retrying later: {str(e)}")
+                continue
+            self._attempts.pop(worksheet_name, None)
+            self._retry_at.pop(worksheet_name, None)
+            if changes:
+                logging.info(f"✅ Mirrored {len(changes)} changes to '{worksheet_name}'")
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="sheets-mirror", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.replicate()
+            except Exception as e:
+                logging.error(f"Sheets mirror error: {str(e)}")
+
+
+sheets_mirror = None
+if getattr(storage, 'change_log', False):
+    sheets_mirror = SheetsMirror(
+        storage,
+        {MASTER_SHEET: sheet1_write, CHECKIN_SHEET: sheet2_write, RSVP_LOG_SHEET: sheet3_write},
+        MIRROR_INTERVAL,
+        WRITE_BATCH_SIZE
+    )
+    sheets_mirror.start()
+
+# --- Checked-In Set ---
+CHECKIN_RECONCILE_INTERVAL = int(os.getenv("CHECKIN_RECONCILE_INTERVAL", 300))  # seconds
+OFFLINE_RETRY_INTERVAL = 30  # seconds between reconnect attempts while running from local data
+
+
+class CheckedInSet:
+    """Authoritative set of guest codes that have checked in, kept in shared state.
+
+    `claim` is an atomic test-and-add, so duplicate detection is a set lookup
+    and two stations (or workers) racing on the same code can't both win. The
+    set is seeded from the Guest Check-In sheet (plus rows still in the
+    write-behind journal) and periodically reconciled with it, so rows removed
+    from the sheet by hand are released again. While Sheets is unreachable it
+    can be seeded from local records instead, and reconciles on reconnect.
+    """
+
+    def __init__(self, loader, interval, shared, name='checked_in'):
+        self._loader = loader
+        self.interval = interval
+        self._shared = shared
+        self._name = name
+        self._thread = None
+        self.loaded_at = None
+        self.source = None  # 'sheet' or 'local'
+
+    @property
+    def version(self):
+        return self._shared.get_version(self._name)
+
+    def claim(self, code):
+        return self._shared.add_member(self._name, normalize_code(code))
+
+    def release(self, code):
+        self._shared.remove_member(self._name, normalize_code(code))
+
+    def __contains__(self, code):
+        return self._shared.has_member(self._name, normalize_code(code))
+
+    def __len__(self):
+        return self._shared.count_members(self._name)
+
+    def members(self):
+        return self._shared.members(self._name)
+
+    def reconcile(self):
+        started_at = time.time()
+        codes = {normalize_code(code) for code in self._loader()}
+        codes.discard('')
+        # Claims made while the sheet was downloading are newer than it and are kept
+        self._shared.replace_members(self._name, codes, added_before=started_at)
+        self.loaded_at = time.time()
+        self.source = 'sheet'
+        logging.info(f"✅ Reconciled {len(self)} checked-in guests.")
+
+    def seed(self, codes):
+        """Claim codes known locally so duplicates are still caught while offline."""
+        for code in codes:
+            if normalize_code(code):
+                self.claim(code)
+        self.source = self.source or 'local'
+        logging.warning(f"📴 Seeded {len(self)} checked-in guests from local records.")
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="checked-in-reconcile", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval if self.source == 'sheet' else min(self.interval, OFFLINE_RETRY_INTERVAL))
+            try:
+                self.reconcile()
+            except Exception as e:
+                logging.error(f"Failed to reconcile checked-in guests: {str(e)}")
+
+
+# --- Check-In Log ---
+CHECKIN_EVENTS = 'checkins'
+CHECKIN_HEADERS = ('TimeStamp', 'GuestCode', 'GuestName', 'Seating', 'AttendedBy')
+
+
+class CheckInLog:
+    """Append-ordered log of Guest Check-In rows, kept as an unbounded shared event stream.
+
+    Event ids are the cursors used by incremental dashboard fetches and by
+    SSE resumes, so readers page forward without re-reading or re-sorting.
+    Each reconcile rebuilds the log from the rows it read if they differ, so
+    rows deleted or edited on the sheet don't linger in the dashboard and
+    exports; readers holding an older cursor are told to reset.
+    """
+
+    def __init__(self, shared, name=CHECKIN_EVENTS):
+        self._shared = shared
+        self.name = name
+
+    @staticmethod
+    def _record(row):
+        return {header: str(row[i]) if i < len(row) else '' for i, header in enumerate(CHECKIN_HEADERS)}
+
+    def append(self, row):
+        return self._shared.append_event(self.name, self._record(row))
+
+    def rebuild(self, rows, mark):
+        """Make the log match `rows` read from storage, keeping whatever was logged after event `mark`."""
+        with self._shared.lock(self.name):
+            events = self.since(0) or []
+            later = {normalize_code(record['GuestCode']) for event_id, record in events if event_id > mark}
+            # One row per guest: a journal row flushed mid-read shows up twice, and a row flushed
+            # after `mark` is already in the log as a later event
+            records, seen = [], set(later)
+            for row in sorted((row for row in rows if len(row) > 1), key=lambda row: row[0]):
+                code = normalize_code(row[1])
+                if code and code not in seen:
+                    seen.add(code)
+                    records.append(self._record(row))
+            current = [record for event_id, record in events if event_id <= mark]
+            key = lambda record: json.dumps(record, sort_keys=True)
+            if Counter(map(key, records)) == Counter(map(key, current)):
+                return
+            self._shared.replace_events(self.name, records, keep_after=mark)
+            logging.info(f"🔄 Rebuilt the check-in log from {len(records)} stored rows")
+
+    def since(self, cursor, limit=None):
+        return self._shared.events_since(self.name, cursor, limit)
+
+    def latest(self):
+        return self._shared.latest_event_id(self.name)
+
+
+checkin_log = CheckInLog(shared_state)
+
+
+def load_checked_in_codes():
+    # Read the journal before the sheet so a flush in between can't hide a row
+    started_at = time.time()
+    mark = checkin_log.latest()
+    pending = write_journal.pending(CHECKIN_SHEET)
+    rows = storage.load_check_ins(fresh_after=started_at) + pending
+    checkin_log.rebuild(rows, mark)  # drops rows removed or edited in storage, adds rows added elsewhere
+    return [row[1] for row in rows if len(row) > 1]
+
+
+def local_checked_in_codes():
+    """Codes checked in according to this station's journal and the shared check-in log."""
+    rows = write_journal.pending(CHECKIN_SHEET)
+    events = checkin_log.since(0) or []
+    return [row[1] for row in rows if len(row) > 1] + [payload.get('GuestCode') for _, payload in events]
+
+
+checked_in = CheckedInSet(load_checked_in_codes, CHECKIN_RECONCILE_INTERVAL, shared_state)
+
+
+def record_check_in(row):
+    """Journal a Guest Check-In row and announce it to live dashboards."""
+    write_journal.append(CHECKIN_SHEET, [row])
+    checkin_log.append(row)
+
+# --- Dashboard Stats ---
+DASHBOARD_STATS_TTL = float(os.getenv("DASHBOARD_STATS_TTL", 15))  # seconds
+STATS_RANGE = 'D2:H2'
+SEATING_CONFIG_PATH = os.getenv("SEATING_CONFIG_PATH", "seating.json")
+
+
+def slugify_seating(value):
+    return re.sub(r'[^a-z0-9]+', '_', str(value or '').strip().lower()).strip('_')
+
+
+@dataclass(frozen=True)
+class SeatingArea:
+    key: str
+    label: str
+    kind: str  # 'zone' or 'table'
+    capacity: int
+    aliases: tuple = ()
+
+
+def load_seating_config(path):
+    """Read the zones and tables, in Reference Sheet column order, plus where that row of counts starts."""
+    with open(path) as f:
+        config = json.load(f)
+    areas = tuple(SeatingArea(
+        key=slugify_seating(area['key']),
+        label=area.get('label') or area['key'].replace('_', ' ').upper(),
+        kind=area.get('kind', 'table'),
+        capacity=int(area.get('capacity', 0)),
+        aliases=tuple(slugify_seating(alias) for alias in area.get('aliases', ()))
+    ) for area in config['areas'])
+    keys = [area.key for area in areas]
+    if len(set(keys)) != len(keys):
+        raise ValueError(f"Duplicate seating keys in {path}")
+    return areas, config.get('reference_start_cell', 'J2')
+
+
+SEATING_AREAS, SEATING_START_CELL = load_seating_config(SEATING_CONFIG_PATH)
+SEATING_KEYS = tuple(area.key for area in SEATING_AREAS)
+SEATING_LABELS = {area.key: area.label for area in SEATING_AREAS}
+SEATING_ALIASES = {alias: area.key for area in SEATING_AREAS for alias in area.aliases}
+
+
+def seating_range(start_cell, width):
+    row, column = gspread.utils.a1_to_rowcol(start_cell)
+    return f"{start_cell}:{gspread.utils.rowcol_to_a1(row, column + width - 1)}"
+
+
+SEATING_RANGE = seating_range(SEATING_START_CELL, len(SEATING_KEYS))
+
+
+@dataclass(frozen=True)
+class DashboardStats:
+    confirmed_rsvp: int
+    declined_rsvp: int
+    total_rsvp: int
+    total_guests: int
+    total_checked_in: int
+    seating: dict
+
+    @staticmethod
+    def _parse_row(value_range, expected, label):
+        row = list(value_range[0]) if value_range else []
+        if len(row) > expected:
+            logging.error(f"🔥Expected {expected} cells in range {label}, got {len(row)}")
+            raise ValueError("Reference sheet format error.")
+        # Sheets drops trailing empty cells, which count as zero
+        row += [''] * (expected - len(row))
+        try:
+            return [int(value or 0) for value in row]
+        except ValueError as e:
+            logging.error(f"Invalid numeric value in Reference Sheet: {e}")
+            raise
+
+    @classmethod
+    def from_ranges(cls, stats_range, seating_range):
+        totals = cls._parse_row(stats_range, 5, STATS_RANGE)
+        seating = cls._parse_row(seating_range, len(SEATING_KEYS), SEATING_RANGE)
+        return cls(*totals, seating=dict(zip(SEATING_KEYS, seating)))
+
+    def as_dict(self):
+        return {
+            'confirmed_rsvp': self.confirmed_rsvp,
+            'declined_rsvp': self.declined_rsvp,
+            'total_rsvp': self.total_rsvp,
+            'total_guests': self.total_guests,
+            'total_checked_in': self.total_checked_in,
+            **self.seating
+        }
+
+
+class TTLCache:
+    """Caches one value for `ttl` seconds; concurrent misses share a single in-flight fetch."""
+
+    def __init__(self, fetch, ttl):
+        self._fetch = fetch
+        self.ttl = ttl
+        self._flights = SingleFlight(reuse=ttl)
+
+    def get(self):
+        return self._flights.do(None, self._fetch)
+
+
+dashboard_stats = TTLCache(storage.reference_stats, DASHBOARD_STATS_TTL)
+
+# --- Live Dashboard Stats ---
+DASHBOARD_STATS_SOURCE = os.getenv("DASHBOARD_STATS_SOURCE", "local")  # local | sheet
+ATTENDANCE_COLUMN = 'J'
+
+
+def seating_key(value):
+    """Map a SEATING ZONE or TABLE ASSIGNED value such as 'TABLE 7' to its stats key."""
+    key = slugify_seating(value)
+    if key.isdigit():
+        key = f'table_{key}'
+    key = SEATING_ALIASES.get(key, key)
+    return key if key in SEATING_KEYS else None
+
+
+class LiveStats:
+    """Dashboard counts derived from the guest index and the checked-in set.
+
+    Zone and table counts are checked-in guests, matching the Reference Sheet
+    cards. Each guest's RSVP bucket and seating keys are remembered so RSVPs,
+    edits and check-ins adjust the counters in place; reading the stats only
+    touches the check-in set when its version has moved.
+    """
+
+    def __init__(self, guests, checked):
+        self._guests = guests
+        self._checked = checked
+        self._lock = threading.Lock()
+        self._rsvp = {}
+        self._seats = {}
+        self._checked_codes = set()
+        self._checked_version = None
+        self._counts = Counter()
+        guests.subscribe(self._on_guests_changed)
+        current = guests.by_code()
+        self._on_guests_changed(guests, current, list(current), [])
+
+    @staticmethod
+    def _rsvp_bucket(value):
+        value = str(value or '').strip().lower()
+        return value if value in ('confirmed', 'declined') else None
+
+    def _count_guest(self, code, sign):
+        rsvp = self._rsvp[code]
+        self._counts['total_guests'] += sign
+        if rsvp:
+            self._counts[f'{rsvp}_rsvp'] += sign
+            self._counts['total_rsvp'] += sign
+        if code in self._checked_codes:
+            self._count_check_in(code, sign)
+
+    def _count_check_in(self, code, sign):
+        self._counts['total_checked_in'] += sign
+        for key in self._seats[code]:
+            self._counts[key] += sign
+
+    def _on_guests_changed(self, index, guests, changed, removed):
+        attendance_header = index.header_for(ATTENDANCE_COLUMN)
+        with self._lock:
+            for code in list(changed) + list(removed):
+                if code in self._rsvp:
+                    self._count_guest(code, -1)
+                    del self._rsvp[code], self._seats[code]
+            for code in changed:
+                guest = guests.get(code)
+                if guest is None:
+                    continue
+                self._rsvp[code] = self._rsvp_bucket(guest.get(attendance_header))
+                self._seats[code] = tuple(key for key in (
+                    seating_key(guest.get('SEATING ZONE')), seating_key(guest.get('TABLE ASSIGNED'))
+                ) if key)
+                self._count_guest(code, +1)
+
+    def _sync_checked_in(self):
+        version = self._checked.version
+        if version == self._checked_version:
+            return
+        codes = self._checked.members()
+        with self._lock:
+            for code in codes - self._checked_codes:
+                self._checked_codes.add(code)
+                if code in self._rsvp:
+                    self._count_check_in(code, +1)
+            for code in self._checked_codes - codes:
+                if code in self._rsvp:
+                    self._count_check_in(code, -1)
+                self._checked_codes.discard(code)
+            self._checked_version = version
+
+    def stats(self):
+        self._guests.sync()
+        self._sync_checked_in()
+        with self._lock:
+            counts = dict(self._counts)
+        return DashboardStats(
+            confirmed_rsvp=counts.get('confirmed_rsvp', 0),
+            declined_rsvp=counts.get('declined_rsvp', 0),
+            total_rsvp=counts.get('total_rsvp', 0),
+            total_guests=counts.get('total_guests', 0),
+            total_checked_in=counts.get('total_checked_in', 0),
+            seating={key: counts.get(key, 0) for key in SEATING_KEYS}
+        )
+
+
+live_stats = LiveStats(guest_index, checked_in)
+
+
+def current_dashboard_stats():
+    if DASHBOARD_STATS_SOURCE == 'sheet':
+        return dashboard_stats.get()
+    return live_stats.stats()
+
+# --- Seating Manifests ---
+class SeatingManifest:
+    """Guests assigned to each zone and table, with their RSVP and check-in status.
+
+    Assignments are kept per seating key by a guest index listener, so they
+    change incrementally with edits and refreshes. Serving a manifest only
+    joins them with the checked-in set, which is re-read when its version moves.
+    """
+
+    def __init__(self, guests, checked):
+        self._guests = guests
+        self._checked = checked
+        self._lock = threading.Lock()
+        self._seats = defaultdict(dict)  # seating key -> {code: entry}
+        self._keys_of = {}
+        self._checked_codes = frozenset()
+        self._checked_version = None
+        guests.subscribe(self._on_guests_changed)
+        current = guests.by_code()
+        self._on_guests_changed(guests, current, list(current), [])
+
+    def _on_guests_changed(self, index, guests, changed, removed):
+        attendance_header = index.header_for(ATTENDANCE_COLUMN)
+        with self._lock:
+            for code in list(changed) + list(removed):
+                for key in self._keys_of.pop(code, ()):
+                    self._seats[key].pop(code, None)
+            for code in changed:
+                guest = guests.get(code)
+                if guest is None:
+                    continue
+                keys = tuple(key for key in (
+                    seating_key(guest.get('SEATING ZONE')), seating_key(guest.get('TABLE ASSIGNED'))
+                ) if key)
+                entry = {
+                    'code': code,
+                    'name': guest.get('GUEST FULL NAME', ''),
+                    'designation': guest.get('DESIGNATION', ''),
+                    'table': guest.get('TABLE ASSIGNED', ''),
+                    'rsvp': str(guest.get(attendance_header) or '').strip().title() or 'Pending',
+                }
+                for key in keys:
+                    self._seats[key][code] = entry
+                self._keys_of[code] = keys
+
+    def _checked_in_codes(self):
+        version = self._checked.version
+        if version != self._checked_version:
+            self._checked_codes, self._checked_version = frozenset(self._checked.members()), version
+        return self._checked_codes
+
+    @staticmethod
+    def _status(guest):
+        if guest['checked_in']:
+            return 'checked_in'
+        return 'declined' if guest['rsvp'] == 'Declined' else 'missing'
+
+    def manifest(self, key):
+        """Guests seated under `key`, still-missing guests first."""
+        self._guests.sync()
+        checked = self._checked_in_codes()
+        with self._lock:
+            entries = list(self._seats.get(key, {}).values())
+        guests = [{**entry, 'checked_in': entry['code'] in checked} for entry in entries]
+        for guest in guests:
+            guest['status'] = self._status(guest)
+        order = {'missing': 0, 'checked_in': 1, 'declined': 2}
+        guests.sort(key=lambda guest: (order[guest['status']], guest['name'].lower()))
+        counts = Counter(guest['status'] for guest in guests)
+        return {
+            'key': key,
+            'label': SEATING_LABELS[key],
+            'assigned': len(guests),
+            'checked_in': counts['checked_in'],
+            'missing': counts['missing'],
+            'declined': counts['declined'],
+            'guests': guests,
+        }
+
+    def summary(self):
+        """Counts for every zone and table, without the guest lists."""
+        return [{k: v for k, v in self.manifest(key).items() if k != 'guests'} for key in SEATING_KEYS]
+
+
+seating_manifest = SeatingManifest(guest_index, checked_in)
+
+# --- Staff Credentials ---
+CREDENTIALS_TTL = int(os.getenv("CREDENTIALS_TTL", 300))  # seconds
+ADMIN_DOC_IDS = ('admins001', 'admins002', 'admins003', 'admins004')
+CHECKIN_DOC_IDS = ADMIN_DOC_IDS + tuple(f'checkIn{number:03d}' for number in range(1, 9))
+
+
+@dataclass(frozen=True)
+class StaffAccount:
+    doc_id: str
+    username: str
+    name: str
+    password_digest: bytes = b''
+    password_hash: str = ''
+
+
+class CredentialStore:
+    """Staff accounts read from Firestore with one batched `get_all`, cached for `ttl` seconds.
+
+    Accounts are indexed by lowercased username. Plain-text passwords are
+    kept only as an HMAC digest under a per-process key and compared with
+    `hmac.compare_digest`; documents that already carry a `password_hash`
+    are checked with Werkzeug. Unknown usernames still pay for one digest
+    so response times don't reveal which usernames exist.
+    """
+
+    def __init__(self, loader, ttl):
+        self._loader = loader
+        self._key = os.urandom(32)
+        self._cache = TTLCache(self._load, ttl)
+
+    def _digest(self, password):
+        return hmac.new(self._key, password.encode('utf-8'), hashlib.sha256).digest()
+
+    def _load(self):
+        by_username, by_id = {}, {}
+        for doc_id, data in self._loader():
+            username = data.get('username', '').strip().lower()
+            account = StaffAccount(
+                doc_id=doc_id,
+                username=username,
+                name=data.get('name', ''),
+                password_digest=self._digest(data['password'].strip()) if data.get('password') else b'',
+                password_hash=data.get('password_hash', '')
+            )
+            by_id[doc_id] = account
+            by_username.setdefault(username, account)  # first document wins, as before
+        logging.info(f"✅ Loaded {len(by_id)} staff accounts.")
+        return by_username, by_id
+
+    def get(self, doc_id):
+        return self._cache.get()[1].get(doc_id)
+
+    def authenticate(self, username, password, allowed_doc_ids):
+        by_username, _ = self._cache.get()
+        account = by_username.get(username.strip().lower())
+        if account is None or account.doc_id not in allowed_doc_ids:
+            hmac.compare_digest(self._digest(password), self._key)
+            return None
+        if account.password_hash:
+            return account if check_password_hash(account.password_hash, password) else None
+        return account if hmac.compare_digest(self._digest(password), account.password_digest) else None
+
+
+staff_credentials = CredentialStore(lambda: storage.staff_documents(CHECKIN_DOC_IDS), CREDENTIALS_TTL)
+
+# --- Background Warm-Up ---
+WARMUP_RETRY_MAX_DELAY = 60  # seconds
+
+
+def warm_caches():
+    """Load guest data and check-ins off the request path.
+
+    If Sheets doesn't answer, the station starts in offline mode from the
+    saved guest snapshot and local check-in records, and the background
+    refreshers reconnect later. Without a snapshot it retries until Sheets answers.
+    """
+    guest_index.sync()  # another worker may already have published a snapshot
+    steps = [('guest data', guest_index.refresh, guest_index.loaded_at is None, guest_index.load_snapshot),
+             ('checked-in guests', checked_in.reconcile, True,
+              lambda: checked_in.seed(local_checked_in_codes()) or True)]
+    for label, load, needed, load_offline in steps:
+        delay = 1
+        while needed:
+            try:
+                load()
+                break
+            except Exception as e:
+                if delay == 1 and load_offline():
+                    logging.error(f"Failed to load {label}, continuing offline: {str(e)}")
+                    break
+                logging.error(f"Failed to load {label}, retrying in {delay}s: {str(e)}")
+                time.sleep(delay)
+                delay = min(delay * 2, WARMUP_RETRY_MAX_DELAY)
+    guest_index.start()
+    checked_in.start()
+
+
+threading.Thread(target=warm_caches, name="warm-caches", daemon=True).start()
+
+
+def caches_loaded():
+    return guest_index.loaded_at is not None and checked_in.source is not None
+
+
+def caches_required(view_func):
+    """Answer 503 until the guest list and checked-in set are loaded.
+
+    Traffic arrives as soon as the port is open. Before warm-up finishes, a
+    valid code would look unknown, and a check-in claim would succeed
+    against an empty set.
+    """
+    @wraps(view_func)
+    def wrapped_view(*args, **kwargs):
+        if not caches_loaded():
+            response = jsonify({'status': 'error', 'message': 'Guest list is still loading, please try again shortly'})
+            response.headers['Retry-After'] = '5'
+            return response, 503
+        return view_func(*args, **kwargs)
+    return wrapped_view
 
 # --- Admin login required decorator ---
 def login_required(f):
@@ -165,6 +2590,16 @@ def authcheckIn_required(view_func):
         return view_func(*args, **kwargs)
     return wrapped_view
 
+# --- Usher or admin login required decorator ---
+def staff_required(view_func):
+    @functools.wraps(view_func)
+    def wrapped_view(*args, **kwargs):
+        if 'checkin_id' not in session and 'admin_id' not in session:
+            flash("Please log in to access this page.", "error")
+            return redirect(url_for('authCheckin'))
+        return view_func(*args, **kwargs)
+    return wrapped_view
+
 # --- Routes ---
 @app.route('/')
 def index():
@@ -175,17 +2610,10 @@ def rsvp():
     return render_template('rsvp.html')
 
 def find_guest_by_code(code):
-    try:
-        records = sheet1_read.get_all_records()
-        for guest in records:
-            if guest['GUEST CODE'].strip().upper() == code:
-                return guest
-        return None
-    except Exception as e:
-        logging.error(f"Error finding guest by code: {str(e)}")
-        return None
+    return guest_index.get(code)
 
 @app.route('/check-code', methods=['POST'])
+@caches_required
 def check_code():
     data = request.get_json()
     code = data['code'].strip().upper()
@@ -215,7 +2643,41 @@ def confirm():
         designation=request.args.get('designation')
     )
 
+VALID_ATTENDANCE = ('Confirmed', 'Declined')
+BULK_RSVP_MAX_ITEMS = 200
+
+
+def apply_rsvps(responses):
+    """Record `(code, attendance)` pairs with one conditional sheet write and one journaled log append.
+
+    Rows come from the guest index, re-read and verified under the write lock,
+    rather than a full download. Returns one result dict per pair, in order.
+    """
+    pairs = [(normalize_code(code), attendance) for code, attendance in responses]
+    changes = {code: [(ATTENDANCE_COLUMN, attendance)] for code, attendance in pairs
+               if attendance in VALID_ATTENDANCE}
+    outcome = write_guest_columns(changes)[0] if changes else {}
+
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    results, log_rows = [], []
+    for code, attendance in pairs:
+        if attendance not in VALID_ATTENDANCE:
+            results.append({"code": code, "status": "error", "message": "Invalid attendance"})
+        elif outcome.get(code) != 'ok':
+            results.append({"code": code, "status": "error", "message": "Guest not found"})
+        else:
+            guest = guest_index.get(code)
+            log_rows.append([timestamp, code, guest.get("GUEST FULL NAME", ""), attendance])
+            results.append({"code": code, "status": "success"})
+
+    if log_rows:
+        logging.info(f"📝 Updated {len(log_rows)} RSVP cells in one batch")
+        write_journal.append(RSVP_LOG_SHEET, log_rows)
+    return results
+
+
 @app.route('/confirm-attendance', methods=['POST'])
+@caches_required
 def confirm_attendance():
     code = request.form.get('code')
     attendance = request.form.get('attendance')
@@ -223,35 +2685,56 @@ def confirm_attendance():
     logging.info(f"🎟️ Received RSVP - Code: {code}, Attendance: {attendance}")
 
     try:
-        data = sheet1_read.get_all_records()
-        refreshed_guest_dict = {row.get("GUEST CODE", ""): row for row in data}
-        guest = refreshed_guest_dict.get(code)
+        result = apply_rsvps([(code, attendance)])[0]
 
-        if guest:
-            row_number = list(refreshed_guest_dict.keys()).index(code) + 2
+        if result['status'] == 'success':
+            logging.info(f"✅ RSVP updated & logged for {code}")
+            return jsonify({"status": "success", "message": "Attendance updated and logged successfully"})
 
-            logging.info(f"📝 Updating RSVP at row {row_number} for guest: {guest.get('GUEST FULL NAME')}")
+        logging.warning(f"⚠️ RSVP rejected for {code}: {result['message']}")
+        return jsonify(result), 404 if result['message'] == "Guest not found" else 400
 
-            sheet1_write.batch_update([{
-                'range': f'J{row_number}',
-                'majorDimension': 'ROWS',
-                'values': [[attendance]]
-            }])
+    except WriteConflict as e:
+        logging.warning(f"⚠️ RSVP write conflict for {code}: {str(e)}")
+        return jsonify({"status": "error", "message": "Guest list is being updated, please try again"}), 409
+    except Exception as e:
+        logging.error(f"❌ Error updating attendance: {str(e)}")
+        return jsonify({"status": "error", "message": "Failed to update attendance"}), 500
 
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            log_entry = [timestamp, code, guest.get("GUEST FULL NAME", ""), attendance]
-            sheet3_write.append_row(log_entry)
 
-            logging.info(f"✅ RSVP updated & logged for {code}")
-            return jsonify({"status": "success", "message": "Attendance updated and logged successfully"})
-        else:
-            logging.warning(f"⚠️ Guest code not found after refresh: {code}")
-            return jsonify({"status": "error", "message": "Guest not found"}), 404
+@app.route('/confirm-attendance/bulk', methods=['POST'])
+@login_required
+@caches_required
+def confirm_attendance_bulk():
+    data = request.get_json(silent=True) or {}
+    responses = data.get('responses')
+
+    if not isinstance(responses, list) or not responses:
+        return jsonify({"status": "error", "message": "A non-empty 'responses' list is required"}), 400
+    if len(responses) > BULK_RSVP_MAX_ITEMS:
+        return jsonify({"status": "error", "message": f"At most {BULK_RSVP_MAX_ITEMS} responses per request"}), 400
+    if not all(isinstance(item, dict) for item in responses):
+        return jsonify({"status": "error", "message": "Each response needs a code and attendance"}), 400
+    duplicates = sorted(code for code, count in Counter(normalize_code(item.get('code', '')) for item in responses).items()
+                        if count > 1)
+    if duplicates:
+        return jsonify({"status": "error", "message": f"Duplicate codes in one request: {', '.join(duplicates)}"}), 400
+
+    logging.info(f"🎟️ Received bulk RSVP with {len(responses)} responses")
 
+    try:
+        results = apply_rsvps([(item.get('code', ''), item.get('attendance')) for item in responses])
+    except WriteConflict as e:
+        logging.warning(f"⚠️ Bulk RSVP write conflict: {str(e)}")
+        return jsonify({"status": "error", "message": "Guest list is being updated, please try again"}), 409
     except Exception as e:
-        logging.error(f"❌ Error updating attendance: {str(e)}")
+        logging.error(f"❌ Error applying bulk RSVP: {str(e)}")
         return jsonify({"status": "error", "message": "Failed to update attendance"}), 500
 
+    succeeded = sum(result['status'] == 'success' for result in results)
+    status = "success" if succeeded == len(results) else "partial" if succeeded else "error"
+    return jsonify({"status": status, "results": results})
+
 
 @app.route('/confirmed')
 def confirmed():
@@ -273,31 +2756,14 @@ def authCheckin():
             return render_template('authCheckin.html'), 400 
         
         try:
-            checkin_doc_id = [
-                'admins001', 'admins002', 'admins003', 'admins004',
-                'checkIn001', 'checkIn002', 'checkIn003', 'checkIn004',
-                'checkIn005', 'checkIn006', 'checkIn007', 'checkIn008'
-            ]
-
-            for doc_id in checkin_doc_id:
-                checkin_doc = db.collection('admins').document(doc_id).get()
-
-                if checkin_doc.exists:
-                    data = checkin_doc.to_dict()
-                    logging.info(f"🔍 Checking '{doc_id}' for username: {username}")
-
-                    if data.get('username', '').strip().lower() == username.lower():
-                        logging.info(f"✅ Username matched in '{doc_id}'")
-
-                        if data.get('password', '').strip() == password:
-                            session['checkin_id'] = doc_id
-                            session['checkin_name'] = data.get('name', username)
-                            logging.info(f"✅ Admin logged in: {username} (from {doc_id})")
-                            return redirect('/checkin')
-                        else:
-                            logging.warning(f"❌ Password mismatch for {username}")
-                            break
-                    
+            account = staff_credentials.authenticate(username, password, CHECKIN_DOC_IDS)
+            if account:
+                session['checkin_id'] = account.doc_id
+                session['checkin_name'] = account.name or username
+                logging.info(f"✅ Admin logged in: {username} (from {account.doc_id})")
+                return redirect('/checkin')
+
+            logging.warning(f"❌ Failed check-in login for {username}")
             error1 = 'Incorrect username or password. Please try again.'
             return render_template('authCheckin.html', error=error1), 401
         
@@ -320,15 +2786,14 @@ def checkin_logout():
 @authcheckIn_required
 def checkin():
         
-# Fetch admin name from Firestore using document ID
+# Admin name comes from the cached staff accounts
         logging.debug(f"Session data: {session}")
-        checkin_adminDoc = db.collection('admins').document(session['checkin_id']).get()
-        if not checkin_adminDoc.exists:
+        checkin_account = staff_credentials.get(session['checkin_id'])
+        if not checkin_account:
             flash("Admin account not found", "error")
             return redirect('/checkin/logout')
         
-        checkin_adminData = checkin_adminDoc.to_dict()
-        checkin_admin_name = checkin_adminData.get('name', 'Admin')
+        checkin_admin_name = checkin_account.name or 'Admin'
         checkin_admin_id = session['checkin_id']
         logging.info(f"Admin ID: {checkin_admin_id}")
         logging.info(f"Admin Name: {checkin_admin_name}")
@@ -338,31 +2803,16 @@ def checkin():
                                admin_id=checkin_admin_id)
 
 @app.route('/search-guest', methods=['GET'])
+@caches_required
 def search_guest():
     query = request.args.get('query', '').strip().upper()
     if not query:
         return jsonify([])
 
-    try:
-        records = sheet1_read.get_all_records()
-
-        results = [
-            {
-                "code": guest['GUEST CODE'],
-                "name": guest['GUEST FULL NAME'],
-                "table": guest.get('TABLE ASSIGNED', 'Unknown'),
-                "seating": guest.get('SEATING ZONE', 'Unknown'),
-                "designation": guest.get('DESIGNATION', 'Unknown')
-            }
-            for guest in records if query in guest['GUEST CODE'].upper() or query in guest['GUEST FULL NAME'].upper()
-        ][:10]
-
-        return jsonify(sorted(results, key=lambda x: x['name']))
-    except Exception as e:
-        logging.error(f"Error searching guest: {str(e)}")
-        return jsonify([])
+    return jsonify(guest_search.search(query))
 
 @app.route('/check-in', methods=['POST'])
+@caches_required
 def check_in():
     data = request.get_json()
     code = data['code'].strip().upper()
@@ -373,11 +2823,12 @@ def check_in():
     if not guest:
         return jsonify({"status": "error", "message": "Guest not found"}), 404
 
+    claimed = False
     try:
         # ✅ Check if the code has already been used
-        existing_codes = sheet2_write.col_values(2)  # Column 2 holds the GuestCode
-        if code in existing_codes:
+        if not checked_in.claim(code):
             return jsonify({"status": "error", "message": "Guest has already checked in"}), 400
+        claimed = True
 
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         new_row = [
@@ -387,15 +2838,18 @@ def check_in():
             guest.get('TABLE ASSIGNED', 'Unknown'),
             attendedby
         ]
-        sheet2_write.append_row(new_row)
+        record_check_in(new_row)
 
         return jsonify({"status": "success", "message": "Check-in successful"})
 
     except Exception as e:
+        if claimed:  # never release another station's check-in
+            checked_in.release(code)
         logging.error(f"Error during check-in: {str(e)}")
         return jsonify({"status": "error", "message": "Failed to check-in guest"}), 500
 
 @app.route('/summary')
+@caches_required
 def summary():
     guest_code = request.args.get('code', '').strip().upper()
 
@@ -403,22 +2857,18 @@ def summary():
         return "Guest code not provided", 400
 
     try:
-        records = sheet1_read.get_all_records()
-        guest_details = next((record for record in records if record['GUEST CODE'] == guest_code), {})
+        guest_details = guest_index.get(guest_code)
 
         if not guest_details:
             return "Guest not found", 404
 
-        checkin_records = sheet2_write.get_all_records()
-        checkin_details = next((rec for rec in checkin_records if rec['GuestCode'] == guest_code), None)
-
         return render_template('summary.html',
             code=guest_code,
-            guest_name=checkin_details.get('GuestName', guest_details.get('GUEST FULL NAME', 'Unknown')) if checkin_details else guest_details.get('GUEST FULL NAME', 'Unknown'),
+            guest_name=guest_details.get('GUEST FULL NAME', 'Unknown'),
             seating_zone=guest_details.get('SEATING ZONE', 'Unknown'),
             table_assigned=guest_details.get('TABLE ASSIGNED', 'Unknown'),
             designation=guest_details.get('DESIGNATION', 'Unknown'),
-            checkin_status="Checked In" if checkin_details else "Not Checked In")
+            checkin_status="Checked In" if guest_code in checked_in else "Not Checked In")
     except Exception as e:
         logging.error(f"Error generating summary: {str(e)}")
         return "Error generating summary", 500
@@ -435,28 +2885,14 @@ def admin_login():
             return render_template('admin_login.html'), 400
 
         try:
-            # List of Firestore admin document IDs
-            admin_docs_to_check = ['admins001', 'admins002', 'admins003', 'admins004']
-
-            for doc_id in admin_docs_to_check:
-                admin_doc = db.collection('admins').document(doc_id).get()
-
-                if admin_doc.exists:
-                    data = admin_doc.to_dict()
-                    logging.info(f"🔍 Checking '{doc_id}' for username: {username}")
-
-                    if data.get('username', '').strip().lower() == username.lower():
-                        logging.info(f"✅ Username matched in '{doc_id}'")
-
-                        if data.get('password', '').strip() == password:
-                            session['admin_id'] = doc_id
-                            session['admin_name'] = data.get('name', username)
-                            logging.info(f"✅ Admin logged in: {username} (from {doc_id})")
-                            return redirect('/admin/dashboard')
-                        else:
-                            logging.warning(f"❌ Password mismatch for {username}")
-                            break  # stop checking after username match
-
+            account = staff_credentials.authenticate(username, password, ADMIN_DOC_IDS)
+            if account:
+                session['admin_id'] = account.doc_id
+                session['admin_name'] = account.name or username
+                logging.info(f"✅ Admin logged in: {username} (from {account.doc_id})")
+                return redirect('/admin/dashboard')
+
+            logging.warning(f"❌ Failed admin login for {username}")
             error = 'Incorrect username or password. Please try again.'
             return render_template('admin_login.html', error=error), 401
 
@@ -483,108 +2919,28 @@ def admin_dashboard():
             flash("Session expired. Please log in again.", "warning")
             return redirect('/admin/login')
 
-        # Fetch admin name from Firestore
-        admin_doc = db.collection('admins').document(admin_id).get()
-        if not admin_doc.exists:
+        # Admin name comes from the cached staff accounts
+        admin_account = staff_credentials.get(admin_id)
+        if not admin_account:
             flash("Admin account not found", "error")
             return redirect('/admin/logout')
 
-        admin_data = admin_doc.to_dict()
-        admin_name = admin_data.get('name', 'Admin')
+        admin_name = admin_account.name or 'Admin'
 
-        # Use sheet4 for Reference Sheet
-        reference_sheet = sheet4_read
-
-       # Fetch stats from Reference Sheet (row 2, cols D to H)
-        stats_cells = reference_sheet.range('D2:H2')
-        seating_cells = reference_sheet.range('J2:AG2')
-
-        if len(seating_cells) != 24:
-            logging.error(f"Expected 24 cells in range J2:AH2, got {len(seating_cells)}")
-            raise ValueError("Reference sheet format error.")
-
-        # Extract and safely parse each value
-        try:
-            kyebi = int(seating_cells[0].value or 0),
-            inkorodu = int(seating_cells[1].value or 0)
-            osu = int(seating_cells[2].value or 0)
-            konongo = int(seating_cells[3].value or 0)
-            jo_squad = int(seating_cells[4].value or 0)
-            table_1 = int(seating_cells[5].value or 0)
-            table_2 = int(seating_cells[6].value or 0)
-            table_3 = int(seating_cells[7].value or 0)
-            table_4 = int(seating_cells[8].value or 0)
-            table_5 = int(seating_cells[9].value or 0)
-            table_6 = int(seating_cells[10].value or 0)
-            table_7 = int(seating_cells[11].value or 0)
-            table_8 = int(seating_cells[12].value or 0)
-            table_9 = int(seating_cells[13].value or 0)
-            table_10 = int(seating_cells[14].value or 0)
-            table_11 = int(seating_cells[15].value or 0)
-            table_12 = int(seating_cells[16].value or 0)
-            table_13 = int(seating_cells[17].value or 0)
-            table_14 = int(seating_cells[18].value or 0)
-            table_15 = int(seating_cells[19].value or 0)
-            table_16 = int(seating_cells[20].value or 0)
-            table_17 = int(seating_cells[21].value or 0)
-            table_18 = int(seating_cells[22].value or 0)
-            high_table = int(seating_cells[23].value or 0)
-        except ValueError as e:
-            logging.error(f"Invalid numeric value in Reference Sheet: {e}")
-            raise
-
-
-        if len(stats_cells) != 5:
-            logging.error(f"🔥Expected 5 cells in range D2:H2, got {len(stats_cells)}")
-            raise ValueError("Reference sheet format error.")
-
-        # Extract and safely parse each value
-        try:
-            total_confirmed_rsvp = int(stats_cells[0].value or 0)
-            total_declined_rsvp = int(stats_cells[1].value or 0)
-            total_rsvp = int(stats_cells[2].value or 0)
-            total_guests = int(stats_cells[3].value or 0)
-            total_checked_in = int(stats_cells[4].value or 0)
-        except ValueError as e:
-            logging.error(f"Invalid numeric value in Reference Sheet: {e}")
-            raise
+        stats = current_dashboard_stats()
 
-        # Fetch check-in data from sheet2 (Check-in Sheet)
-        checkin_data = sorted(sheet2_write.get_all_records(), key=lambda x: x.get('TimeStamp', ''), reverse=False)
+        # Check-in rows in arrival order; live updates resume after the last one
+        events = checkin_log.since(0) or []
+        checkin_data = [record for _, record in events]
+        stream_cursor = events[-1][0] if events else 0
 
         return render_template(
             'admin_dashboard.html', 
             name_of_admin=admin_name, 
-            confirmed_rsvp=total_confirmed_rsvp,
-            declined_rsvp=total_declined_rsvp,
-            total_rsvp=total_rsvp,
-            total_checked_in=total_checked_in,
-            total_guests=total_guests,
             checkin_data=checkin_data,
-            kyebi=kyebi,
-            inkorodu=inkorodu,
-            osu=osu,
-            konongo=konongo,
-            jo_squad=jo_squad,
-            table_1=table_1,
-            table_2=table_2,
-            table_3=table_3,
-            table_4=table_4,
-            table_5=table_5,
-            table_6=table_6,
-            table_7=table_7,
-            table_8=table_8,
-            table_9=table_9,
-            table_10=table_10,
-            table_11=table_11,
-            table_12=table_12,
-            table_13=table_13,
-            table_14=table_14,
-            table_15=table_15,
-            table_16=table_16,
-            table_17=table_17,
-            table_18=table_18,
-            high_table=high_table
+            stream_cursor=stream_cursor,
+            stats=stats.as_dict(),
+            seating_areas=SEATING_AREAS
         )
 
     except Exception as e:
@@ -592,13 +2948,29 @@ def admin_dashboard():
         flash("Error loading dashboard", "error")
         return redirect('/admin/login')
     
+CHECKIN_PAGE_SIZE = 500
+CHECKIN_PAGE_SIZE_MAX = 2000
+
     # -- Ajax call to update the check-in status -- 
 @app.route('/admin/fetch-checkin-data')
 @login_required
 def fetch_checkin_data():
     try:
-        checkin_data = sorted(sheet2_write.get_all_records(), key=lambda x: x.get('TimeStamp', ''), reverse=False)
-        return jsonify({'status': 'success', 'data': checkin_data})
+        since = request.args.get('since', 0, type=int)
+        limit = max(1, min(request.args.get('limit', CHECKIN_PAGE_SIZE, type=int), CHECKIN_PAGE_SIZE_MAX))
+        events = checkin_log.since(since, limit + 1)
+        reset = events is None
+        if reset:
+            # The cursor predates this log (e.g. after a restart); start over
+            events = checkin_log.since(0, limit + 1)
+        page = events[:limit]
+        return jsonify({
+            'status': 'success',
+            'data': [record for _, record in page],
+            'next_cursor': page[-1][0] if page else (0 if reset else since),
+            'has_more': len(events) > limit,
+            'reset': reset
+        })
     except Exception as e:
         logging.error(f"Error fetching check-in data: {str(e)}")
         return jsonify({'status': 'error', 'message': 'Failed to fetch check-in data.'})
@@ -607,63 +2979,83 @@ def fetch_checkin_data():
 @login_required
 def fetch_dashboard_stats():
     try:
-        stats_cells = sheet4_read.range('D2:H2')
-        seating_cells = sheet4_read.range('J2:AG2')
-
-        if len(seating_cells) != 24:
-            return jsonify({'status': 'error', 'message': 'Invalid seating format'})
-
-        if len(stats_cells) != 5:
-            return jsonify({'status': 'error', 'message': 'Invalid stats format'})
-
-        data = {
-            'confirmed_rsvp': int(stats_cells[0].value or 0),
-            'declined_rsvp': int(stats_cells[1].value or 0),
-            'total_rsvp': int(stats_cells[2].value or 0),
-            'total_guests': int(stats_cells[3].value or 0),
-            'total_checked_in': int(stats_cells[4].value or 0),
-            'kyebi': int(seating_cells[0].value or 0),
-            'inkorodu': int(seating_cells[1].value or 0),
-            'osu': int(seating_cells[2].value or 0),
-            'konongo': int(seating_cells[3].value or 0),
-            'jo_squad': int(seating_cells[4].value or 0),
-            'table_1': int(seating_cells[5].value or 0),
-            'table_2': int(seating_cells[6].value or 0),
-            'table_3': int(seating_cells[7].value or 0),
-            'table_4': int(seating_cells[8].value or 0),
-            'table_5': int(seating_cells[9].value or 0),
-            'table_6': int(seating_cells[10].value or 0),
-            'table_7': int(seating_cells[11].value or 0),
-            'table_8': int(seating_cells[12].value or 0),
-            'table_9': int(seating_cells[13].value or 0),
-            'table_10': int(seating_cells[14].value or 0),
-            'table_11': int(seating_cells[15].value or 0),
-            'table_12': int(seating_cells[16].value or 0),
-            'table_13': int(seating_cells[17].value or 0),
-            'table_14': int(seating_cells[18].value or 0),
-            'table_15': int(seating_cells[19].value or 0),
-            'table_16': int(seating_cells[20].value or 0),
-            'table_17': int(seating_cells[21].value or 0),
-            'table_18': int(seating_cells[22].value or 0),
-            'high_table': int(seating_cells[23].value or 0)
-        }
+        data = current_dashboard_stats().as_dict()
 
         return jsonify({'status': 'success', 'data': data})
     except Exception as e:
         logging.error(f"Error fetching dashboard stats: {str(e)}")
         return jsonify({'status': 'error', 'message': 'Failed to fetch stats.'})
 
+# -- Server-Sent Events stream for the live dashboard --
+SSE_MAX_SECONDS = int(os.getenv("SSE_MAX_SECONDS", 300))  # browsers reconnect transparently
+SSE_HEARTBEAT_SECONDS = 15
+
+
+def sse_message(event, data, event_id=None):
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines += [f"event: {event}", f"data: {json.dumps(data)}"]
+    return "\n".join(lines) + "\n\n"
+
+
+@app.route('/admin/stream')
+@login_required
+def admin_stream():
+    try:
+        cursor = int(request.headers.get('Last-Event-ID') or request.args['last_event_id'])
+    except (KeyError, ValueError):
+        cursor = checkin_log.latest()
+
+    def generate(cursor):
+        deadline = time.time() + SSE_MAX_SECONDS
+        sent_stats = {}
+        last_sent = time.time()
+        yield "retry: 3000\n\n"
+        while time.time() < deadline:
+            events = checkin_log.since(cursor, limit=100)
+            if events is None:
+                # Too far behind (or the server restarted): the client reloads in full
+                cursor = checkin_log.latest()
+                yield sse_message('reset', {}, cursor)
+                events = []
+            for event_id, record in events:
+                cursor = event_id
+                yield sse_message('checkin', record, event_id)
+
+            try:
+                stats = current_dashboard_stats().as_dict()
+            except Exception as e:
+                logging.error(f"Error computing stream stats: {str(e)}")
+                stats = sent_stats
+            delta = {key: value for key, value in stats.items() if sent_stats.get(key) != value}
+            if delta:
+                yield sse_message('stats', delta)
+                sent_stats = stats
+
+            if events or delta:
+                last_sent = time.time()
+            elif time.time() - last_sent >= SSE_HEARTBEAT_SECONDS:
+                yield ": keep-alive\n\n"
+                last_sent = time.time()
+            shared_state.wait_for_event(checkin_log.name, cursor, timeout=1)
+
+    return Response(
+        stream_with_context(generate(cursor)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # --- SEARCH FUNCTIONALITY ---
 @app.route('/admin/search', methods=['POST'])
 @login_required
+@caches_required
 def search_guest_admin():
     search_query = request.form.get('search_query', '').lower()
     if not search_query:
         return jsonify([])
     
     try:
-        rsvp_data = sheet1_read.get_all_records()
-        results = [guest for guest in rsvp_data if search_query in guest['Guest FULL NAME'].lower() or search_query in guest['GUEST CODE'].lower()]
+        results = [{**guest, 'etag': guest_index.etag(guest['GUEST CODE'])} for guest in guest_index.all()
+                   if search_query in guest['GUEST FULL NAME'].lower() or search_query in guest['GUEST CODE'].lower()]
         return jsonify(results)
     except Exception as e:
         logging.error(f"Search error: {str(e)}")
@@ -672,17 +3064,21 @@ def search_guest_admin():
 # --- MANUAL CHECK-IN ---
 @app.route('/admin/checkin', methods=['POST'])
 @login_required
+@caches_required
 def manual_checkin():
     guest_code = request.form.get('guest_code', '').strip()
     if not guest_code:
         return jsonify({'status': 'error', 'message': 'Guest code required'}), 400
     
+    claimed = False
     try:
-        rsvp_data = sheet1_read.get_all_records()
-        guest = next((g for g in rsvp_data if g['GUEST CODE'] == guest_code), None)
+        guest = guest_index.get(guest_code)
 
         if guest:
-            sheet2_write.append_row([
+            if not checked_in.claim(guest_code):
+                return jsonify({'status': 'error', 'message': 'Guest has already checked in'}), 400
+            claimed = True
+            record_check_in([
                 datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
                 guest['GUEST CODE'],
                 guest['GUEST FULL NAME'],
@@ -694,12 +3090,15 @@ def manual_checkin():
         
         return jsonify({'status': 'error', 'message': 'Guest not found!'}), 404
     except Exception as e:
+        if claimed:  # never release another station's check-in
+            checked_in.release(guest_code)
         logging.error(f"Manual check-in error: {str(e)}")
         return jsonify({'status': 'error', 'message': 'Failed to check in guest'}), 500
 
 # --- EDIT GUEST DETAILS ---
 @app.route('/admin/edit', methods=['POST'])
 @login_required
+@caches_required
 def edit_guest():
     guest_code = request.form.get('guest_code', '').strip()
     new_name = request.form.get('new_name', '').strip()
@@ -709,16 +3108,23 @@ def edit_guest():
         return jsonify({'status': 'error', 'message': 'Guest code and name are required'}), 400
 
     try:
-        data = sheet1_read.get_all_records()
-        row_index = next((i for i, g in enumerate(data, start=2) if g['GUEST CODE'] == guest_code), None)
-
-        if row_index:
-            sheet1_write.update(f"C{row_index}", new_name)  # Update Name
-            if new_seating:
-                sheet1_write.update(f"K{row_index}", new_seating)  # Update Seating Zone
-            return jsonify({'status': 'success', 'message': 'Guest details updated!'})
-        
+        changes = [('C', new_name)]  # Name
+        if new_seating:
+            changes.append(('K', new_seating))  # Seating Zone
+        results, etags = write_guest_columns({guest_code: changes}, {guest_code: request.form.get('etag')})
+        result = results[normalize_code(guest_code)]
+
+        if result == 'ok':
+            return jsonify({'status': 'success', 'message': 'Guest details updated!',
+                            'etag': etags[normalize_code(guest_code)]})
+        if result == 'conflict':
+            return jsonify({'status': 'error', 'message': 'Guest was changed by someone else. Reload and try again.',
+                            'etag': guest_index.etag(guest_code)}), 409
+
         return jsonify({'status': 'error', 'message': 'Guest not found!'}), 404
+    except WriteConflict as e:
+        logging.warning(f"Edit guest conflict: {str(e)}")
+        return jsonify({'status': 'error', 'message': 'Guest list is being updated, please try again'}), 409
     except Exception as e:
         logging.error(f"Edit guest error: {str(e)}")
         return jsonify({'status': 'error', 'message': 'Failed to update guest'}), 500
@@ -726,73 +3132,184 @@ def edit_guest():
 # --- DELETE GUEST RECORD ---
 @app.route('/admin/delete', methods=['POST'])
 @login_required
+@caches_required
 def delete_guest():
     guest_code = request.form.get('guest_code', '').strip()
     if not guest_code:
         return jsonify({'status': 'error', 'message': 'Guest code required'}), 400
 
     try:
-        data = sheet1_read.get_all_records()
-        row_index = next((i for i, g in enumerate(data, start=2) if g['GUEST CODE'] == guest_code), None)
+        result = delete_guest_row(guest_code, request.form.get('etag'))
 
-        if row_index:
-            sheet1_write.delete_row(row_index)
+        if result == 'ok':
             return jsonify({'status': 'success', 'message': 'Guest record deleted!'})
-        
+        if result == 'conflict':
+            return jsonify({'status': 'error', 'message': 'Guest was changed by someone else. Reload and try again.',
+                            'etag': guest_index.etag(guest_code)}), 409
+
         return jsonify({'status': 'error', 'message': 'Guest not found!'}), 404
+    except WriteConflict as e:
+        logging.warning(f"Delete guest conflict: {str(e)}")
+        return jsonify({'status': 'error', 'message': 'Guest list is being updated, please try again'}), 409
     except Exception as e:
         logging.error(f"Delete guest error: {str(e)}")
         return jsonify({'status': 'error', 'message': 'Failed to delete guest'}), 500
 
-# --- EXPORT TO CSV ---
-@app.route('/admin/export/csv')
+# --- EXPORTS ---
+EXPORT_FILENAME = 'checked_in_guests'
+
+
+def check_in_export_rows():
+    """Check-in rows, oldest first, paged from the cached check-in log rather than the sheet."""
+    cursor = 0
+    while True:
+        events = checkin_log.since(cursor, CHECKIN_PAGE_SIZE) or []
+        for event_id, record in events:
+            cursor = event_id
+            yield [record.get(header, '') for header in CHECKIN_HEADERS]
+        if len(events) < CHECKIN_PAGE_SIZE:
+            return
+
+
+class _LineBuffer:
+    """File-like sink that hands back what csv.writer writes, so rows can be yielded one at a time."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    writer = csv.writer(_LineBuffer())
+    yield writer.writerow(CHECKIN_HEADERS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def build_xlsx(rows):
+    workbook = openpyxl.Workbook(write_only=True)
+    worksheet = workbook.create_sheet(CHECKIN_SHEET)
+    worksheet.append(CHECKIN_HEADERS)
+    for row in rows:
+        worksheet.append(row)
+    output = io.BytesIO()
+    workbook.save(output)
+    output.seek(0)
+    return output
+
+
+def build_pdf(rows):
+    output = io.BytesIO()
+    styles = getSampleStyleSheet()
+    table = LongTable([CHECKIN_HEADERS, *rows], repeatRows=1)
+    table.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+        ('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
+        ('FONTSIZE', (0, 0), (-1, -1), 9),
+    ]))
+    document = SimpleDocTemplate(output, pagesize=landscape(A4), title="Checked-In Guests")
+    document.build([Paragraph("Checked-In Guests", styles['Title']), table])
+    output.seek(0)
+    return output
+
+
+@app.route('/admin/export/<export_format>')
 @login_required
-def export_csv():
+def export_check_ins(export_format):
     try:
-        # Get data from Google Sheet
-        data = sheet2_write.get_all_records()
-        df = pd.DataFrame(data)
-
-        # Create in-memory file-like object
-        output = io.StringIO()
-        df.to_csv(output, index=False)
-        output.seek(0)
-
-        # Create response with proper headers
-        response = Response(
-            output.getvalue(),
-            mimetype="text/csv",
-            headers={
-                "Content-Disposition": "attachment;filename=checked_in_guests.csv",
-                "Content-Type": "text/csv; charset=utf-8"
-            }
-        )
+        if export_format == 'csv':
+            return Response(
+                stream_with_context(stream_csv(check_in_export_rows())),
+                mimetype="text/csv",
+                headers={"Content-Disposition": f"attachment;filename={EXPORT_FILENAME}.csv"}
+            )
 
-        return response
+        if export_format == 'xlsx':
+            if openpyxl is None:
+                return jsonify({'status': 'error', 'message': 'XLSX export is not available (install openpyxl)'}), 501
+            return send_file(
+                build_xlsx(check_in_export_rows()),
+                mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                as_attachment=True,
+                download_name=f"{EXPORT_FILENAME}.xlsx"
+            )
+
+        if export_format == 'pdf':
+            if SimpleDocTemplate is None:
+                return jsonify({'status': 'error', 'message': 'PDF export is not available (install reportlab)'}), 501
+            return send_file(build_pdf(check_in_export_rows()), mimetype="application/pdf",
+                             as_attachment=True, download_name=f"{EXPORT_FILENAME}.pdf")
+
+        return jsonify({'status': 'error', 'message': 'Unknown export format'}), 404
 
     except Exception as e:
-        logging.error(f"Export CSV error: {str(e)}")
-        return jsonify({'status': 'error', 'message': 'Failed to export CSV'}), 500
-    
+        logging.error(f"Export {export_format} error: {str(e)}")
+        return jsonify({'status': 'error', 'message': 'Failed to export check-ins'}), 500
+
+# --- SEATING MANIFESTS ---
+@app.route('/manifest')
+@staff_required
+@caches_required
+def seating_manifests():
+    return jsonify({'status': 'success', 'manifests': seating_manifest.summary()})
+
+@app.route('/manifest/<key>')
+@staff_required
+@caches_required
+def seating_manifest_detail(key):
+    if key not in SEATING_KEYS:
+        return jsonify({'status': 'error', 'message': 'Unknown table or zone'}), 404
+
+    manifest = seating_manifest.manifest(key)
+    status = request.args.get('status')
+    if status:
+        manifest['guests'] = [guest for guest in manifest['guests'] if guest['status'] == status]
+    return jsonify({'status': 'success', **manifest})
+
+@app.route('/manifest/<key>/print')
+@staff_required
+@caches_required
+def seating_manifest_print(key):
+    if key not in SEATING_KEYS:
+        return render_template('404error.html'), 404
+    return render_template('seating_manifest.html', manifest=seating_manifest.manifest(key),
+                           printed_at=datetime.now().strftime("%Y-%m-%d %H:%M"))
+
 @app.errorhandler(404)
 def handle_404(e):
     return render_template('404error.html'), 404
 
 
-# Health check endpoint
+# Liveness: the process is up and serving; never touches the network
 @app.route('/health')
 def health_check():
-    if check_firestore_connection():
-        return jsonify({
-            'status': 'healthy',
-            'database': 'connected',
-            'sheets': 'connected' if sheet1_read else 'disconnected'
-        }), 200
+    return jsonify({'status': 'alive'}), 200
+
+# Readiness: guest data and check-ins are loaded so lookups can be answered
+@app.route('/ready')
+def readiness_check():
+    ready = caches_loaded()
+    offline = (guest_index.source == 'snapshot' or checked_in.source == 'local'
+               or guest_index.failing_since is not None or bool(write_journal.stalled()))
     return jsonify({
-        'status': 'unhealthy',
-        'database': 'disconnected',
-        'sheets': 'connected' if sheet1_read else 'disconnected'
-    }), 503
+        'status': 'ready' if ready else 'warming',
+        'mode': 'offline' if offline else 'online',
+        'stalled_writes': write_journal.stalled(),
+        **storage.status(),
+        'guest_index': guest_index.info(),
+        'checked_in': len(checked_in) if checked_in.source else None,
+        'pending_writes': write_journal.depth(),
+        'replication': sheets_mirror.lag() if sheets_mirror else None,
+        'sheets_quota': sheets_quota.info(),
+        'read_pool': sheet1_read.info()
+    }), 200 if ready else 503
+
+# Copy the live workbook and staff accounts into the SQLite store
+@app.cli.command('import-storage')
+def import_storage():
+    target = storage if isinstance(storage, SqliteStorage) else SqliteStorage(STORAGE_PATH)
+    target.import_from(SheetsStorage(), CHECKIN_DOC_IDS)
+
 
 if __name__ == '__main__':
     port = int(os.environ.get("PORT", 8080))